@@ -6,8 +6,14 @@ import json
 import sys
 import threading
 import select
+import datetime
 from urllib.parse import urlparse
 
+SCHEDULE_WINDOW = 50  # Airings fetched per schedule sync (a few hours of music)
+RESYNC_BEFORE = 600  # Seconds before the fetched window runs out that the next sync happens
+RETRY_DELAY = 5  # Seconds to wait after a failed sync
+MAX_RETRY_DELAY = 60  # Upper bound on the back-off while the schedule has no airing for now
+
 class PlexRadioClient:
     def __init__(self, api_base_url="http://localhost:5000"):
         self.api_base_url = api_base_url
@@ -18,6 +24,9 @@ class PlexRadioClient:
         self.next_channel = None
         self.current_channel = 0
         self.channels = []
+        self.airings = []  # Fetched window of the current channel's schedule
+        self.clock_offset = 0.0  # Server clock minus local clock, in seconds
+        self.resync_needed = False  # Set when the server signals a schedule change
         
     def get_current_song(self, channel=None):
         """Get current song information from the API"""
@@ -44,6 +53,92 @@ class PlexRadioClient:
             print(f"JSON decode error: {e}")
             return None
     
+    def get_schedule(self, channel, count=SCHEDULE_WINDOW):
+        """
+        Fetch the next airings of a channel with absolute start and end times.
+        Returns (airings, clock_offset), or (None, 0.0) if the request failed.
+        """
+        try:
+            url = f"{self.api_base_url}/schedule/{channel}"
+            sent = time.time()
+            response = requests.get(url, params={"count": count}, stream=True, timeout=10)
+            received = time.time()  # Headers are in; X-Server-Time was stamped in between
+            response.raise_for_status()
+            airings = [json.loads(line) for line in response.iter_lines() if line]
+        except requests.exceptions.RequestException as e:
+            print(f"Request failed: {e}")
+            return None, 0.0
+        except json.JSONDecodeError as e:
+            print(f"JSON decode error: {e}")
+            return None, 0.0
+
+        for airing in airings:
+            # Servers without Unix timestamps send local times only; assume our time zone matches
+            if "start_timestamp" not in airing:
+                airing["start_timestamp"] = datetime.datetime.fromisoformat(airing["start"]).timestamp()
+                airing["end_timestamp"] = datetime.datetime.fromisoformat(airing["end"]).timestamp()
+
+        server_time = response.headers.get("X-Server-Time")
+        clock_offset = float(server_time) - (sent + received) / 2 if server_time else 0.0
+        return airings, clock_offset
+
+    def server_now(self):
+        """Current time on the server's clock"""
+        return time.time() + self.clock_offset
+
+    def find_airing(self, when):
+        """Return the fetched airing playing at the given server time, or None"""
+        for airing in self.airings:
+            if airing["start_timestamp"] <= when < airing["end_timestamp"]:
+                return airing
+        return None
+
+    def sync_schedule(self):
+        """Fetch a fresh schedule window; returns False if the server could not be reached"""
+        airings, clock_offset = self.get_schedule(self.current_channel)
+        if not airings:
+            return False
+        self.airings = airings
+        self.clock_offset = clock_offset
+        self.resync_needed = False
+        return True
+
+    def needs_sync(self):
+        """Check if the schedule window is nearly used up or the server signaled a change"""
+        if self.resync_needed or not self.airings:
+            return True
+        return self.airings[-1]["end_timestamp"] - self.server_now() < RESYNC_BEFORE
+
+    def watch_events(self, channel):
+        """
+        Follow the channel's event stream and flag a re-sync when the track the
+        server reports is not in our schedule window (e.g. after the channel was
+        reconfigured). The stream only carries one event per track change.
+        """
+        try:
+            url = f"{self.api_base_url}/events/{channel}"
+            with requests.get(url, stream=True, timeout=(10, None)) as response:
+                response.raise_for_status()
+                event = None
+                for line in response.iter_lines(decode_unicode=True):
+                    if self.should_stop or channel != self.current_channel:
+                        return
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                    elif line.startswith("data:") and event == "track":
+                        data = json.loads(line[len("data:"):])
+                        known = any(
+                            airing["title"] == data.get("title") and airing["start"] == data.get("started_at")
+                            for airing in self.airings
+                        )
+                        if self.airings and not known:
+                            self.resync_needed = True
+        except (requests.exceptions.RequestException, json.JSONDecodeError):
+            pass  # Without the stream we still re-sync when the window runs out
+
+    def start_event_watcher(self):
+        threading.Thread(target=self.watch_events, args=(self.current_channel,), daemon=True).start()
+
     def get_channels(self):
         """Get available channels from the API"""
         try:
@@ -129,6 +224,15 @@ class PlexRadioClient:
             
             time.sleep(0.1)
     
+    def wait_for_command(self, seconds):
+        """Sleep for up to seconds, returning early on a channel change or stop"""
+        deadline = time.monotonic() + seconds
+        while not (self.should_stop or self.should_change_channel):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(0.1, remaining))
+    
     def change_channel(self, channel_num):
         """Change to a specific channel"""
         if 0 <= channel_num < len(self.channels):
@@ -195,8 +299,9 @@ class PlexRadioClient:
         try:
             print(f"Playing: {song_info.get('title', 'Unknown')} by {song_info.get('artist', 'Unknown')}")
             print(f"Album: {song_info.get('album', 'Unknown')}")
-            if song_info.get("start_time"):
-                print(f"Starting at: {song_info['start_time']} seconds")
+            offset = start_time if start_time is not None else song_info.get("start_time")
+            if offset:
+                print(f"Starting at: {offset} seconds")
             
             # Start ffplay process (non-blocking)
             self.current_process = subprocess.Popen(
@@ -211,8 +316,12 @@ class PlexRadioClient:
             print(f"ffplay error: {e}")
             return False
 
-    def radio_mode(self, starting_channel=0, check_interval=30):
-        """Interactive radio mode with channel switching"""
+    def radio_mode(self, starting_channel=0):
+        """
+        Interactive radio mode with channel switching. The schedule is fetched
+        a window at a time and each track is started locally at its scheduled
+        time, so the client stays in step with the server without polling it.
+        """
         # Load available channels
         self.channels = self.get_channels()
         if not self.channels:
@@ -226,18 +335,20 @@ class PlexRadioClient:
             self.current_channel = 0
             
         print(f"Starting radio mode on channel {self.current_channel}: {self.channels[self.current_channel]['name']}")
-        print(f"Checking for song changes every {check_interval} seconds")
         
         # Initialize control flags
         self.should_stop = False
         self.should_change_channel = False
         self.next_channel = None
+        self.airings = []
         
         # Start keyboard input handler thread
         self.input_thread = threading.Thread(target=self.handle_keyboard_input, daemon=True)
         self.input_thread.start()
+        self.start_event_watcher()
         
-        last_song_title = None
+        playing = None  # (index, start, title) of the airing being played
+        misses = 0  # Consecutive syncs whose schedule had no airing for now
         
         try:
             while not self.should_stop:
@@ -246,31 +357,44 @@ class PlexRadioClient:
                     self.current_channel = self.next_channel
                     self.should_change_channel = False
                     self.next_channel = None
-                    last_song_title = None  # Force new song fetch
+                    self.airings = []
+                    playing = None
+                    misses = 0
                     print(f"Switched to channel {self.current_channel}: {self.channels[self.current_channel]['name']}")
+                    self.start_event_watcher()
                 
-                # Get current song for current channel
-                song_info = self.get_current_song(self.current_channel)
+                # Re-sync only when the window is nearly used up or the server signaled a change
+                if self.needs_sync() and not self.sync_schedule():
+                    time.sleep(RETRY_DELAY)
+                    continue
                 
-                if song_info:
-                    current_title = song_info.get("title")
-                    
-                    # Check if the song has changed or if we need to start playing
-                    if current_title != last_song_title:
-                        print(f"\n--- Channel {self.current_channel}: {self.channels[self.current_channel]['name']} ---")
-                        if self.play_song(song_info):
-                            last_song_title = current_title
-
-                # Wait before checking again, but check control flags frequently
-                for _ in range(check_interval * 10):  # Check every 0.1 seconds
-                    if self.should_stop or self.should_change_channel:
+                now = self.server_now()
+                airing = self.find_airing(now)
+                if airing is None:
+                    # Back off before refetching, or a schedule that doesn't cover now
+                    # (e.g. a channel still warming up) is requested in a tight loop
+                    delay = min(RETRY_DELAY * 2 ** misses, MAX_RETRY_DELAY)
+                    misses += 1
+                    print(f"No track scheduled for now, re-syncing in {delay}s")
+                    self.wait_for_command(delay)
+                    self.resync_needed = True
+                    continue
+                misses = 0
+                
+                # Start the airing on time, joining it part-way through if needed. A re-sync
+                # that moved the current airing changes its key, which restarts it in step.
+                key = (airing["index"], airing["start"], airing["title"])
+                if key != playing:
+                    print(f"\n--- Channel {self.current_channel}: {self.channels[self.current_channel]['name']} ---")
+                    if self.play_song(airing, start_time=round(max(0.0, now - airing["start_timestamp"]), 2)):
+                        playing = key
+                
+                # Sleep until the airing ends, waking often for commands
+                while not (self.should_stop or self.should_change_channel or self.resync_needed):
+                    remaining = airing["end_timestamp"] - self.server_now()
+                    if remaining <= 0:
                         break
-                    # Check if current process ended (song finished)
-                    if self.current_process and self.current_process.poll() is not None:
-                        print("Song ended, checking for next song...")
-                        if self.play_song(song_info.get("next_song")):
-                            last_song_title = song_info.get("next_song").get("title")
-                    time.sleep(0.1)
+                    time.sleep(min(0.1, remaining))
                 
         except KeyboardInterrupt:
             print("\nReceived Ctrl+C, stopping...")
@@ -300,6 +424,16 @@ def main():
             channel = int(sys.argv[2]) if len(sys.argv) > 2 else 0
             client.radio_mode(channel)
         
+        elif command == "schedule":
+            # Show the upcoming airings with local start times
+            channel = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+            airings, clock_offset = client.get_schedule(channel, count=10)
+            for airing in airings or []:
+                start = datetime.datetime.fromtimestamp(airing["start_timestamp"] - clock_offset)
+                print(f"  {start:%H:%M:%S}  {airing.get('title')} - {airing.get('artist')}")
+            if airings:
+                print(f"Server clock offset: {clock_offset:+.3f}s")
+        
         elif command == "info":
             # Just get song info without playing
             channel = int(sys.argv[2]) if len(sys.argv) > 2 else None
@@ -320,6 +454,7 @@ def print_usage():
     print("Usage:")
     print("  python example_client.py channels          - List available channels")
     print("  python example_client.py info [channel]    - Get current song info")
+    print("  python example_client.py schedule [channel] - Show upcoming songs")
     print("  python example_client.py radio [channel]   - Interactive radio mode")
     print()
     print("Radio Mode Commands:")
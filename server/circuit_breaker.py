@@ -0,0 +1,89 @@
+import threading
+import time
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open"""
+
+class CircuitBreaker:
+    """
+    Stops calling a failing service so callers fail fast instead of waiting on
+    timeouts. After failure_threshold consecutive failures the circuit opens;
+    once reset_timeout seconds pass, a single trial call is let through and
+    its result closes or re-opens the circuit.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=30, excluded_exceptions=()):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout  # Seconds to stay open before a trial call
+        self.excluded_exceptions = tuple(excluded_exceptions)  # Errors that prove the service is up
+        self.failures = 0  # Consecutive failures
+        self.opened_at = None  # time.monotonic() when the circuit last opened
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def retry_in(self):
+        """Seconds until the next trial call is allowed (0 if calls are allowed now)"""
+        with self._lock:
+            if self.opened_at is None:
+                return 0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow_call(self):
+        """Return True if a call may go through now, reserving the trial slot when half open"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                print(f"{self.name} circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_progress = False
+            # A failed trial re-opens the circuit for another reset_timeout
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"{self.name} circuit opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+    def call(self, function, *args, **kwargs):
+        """Call function through the breaker, raising CircuitOpenError while the circuit is open"""
+        if not self.allow_call():
+            raise CircuitOpenError(f"{self.name} unavailable, retrying in {self.retry_in():.0f}s")
+        try:
+            result = function(*args, **kwargs)
+        except self.excluded_exceptions:
+            self.record_success()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
@@ -1,15 +1,40 @@
+import os
+import threading
+import time
 import yaml
 
 class Config:
     def __init__(self, config_file='config.yaml'):
         self.config_file = config_file
+        self.mtime = self.get_mtime()
         self.config = self.load_config()
+        # Channels are validated once and indexed by position and by name
+        self.channels, self.channels_by_name = self.build_channel_index(self.config)
+        self._watch_thread = None
+
+    def get_mtime(self):
+        """Return the config file's modification time, or None if it doesn't exist"""
+        try:
+            return os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def read_config_file(self):
+        """
+        Read and parse the YAML file, raising on any error. An empty file or a
+        top-level value that is not a mapping counts as a parse error: it is
+        what the watcher sees while an editor is rewriting the file.
+        """
+        with open(self.config_file, 'r') as file:
+            config = yaml.safe_load(file)
+        if not isinstance(config, dict) or not config:
+            raise yaml.YAMLError("config file is empty or not a mapping")
+        return config
     
     def load_config(self):
         """Load configuration from YAML file"""
         try:
-            with open(self.config_file, 'r') as file:
-                return yaml.safe_load(file)
+            return self.read_config_file()
         except FileNotFoundError:
             print(f"Config file {self.config_file} not found, using defaults")
             return self.get_default_config()
@@ -29,24 +54,23 @@ class Config:
         """Get Plex server configuration from config"""
         return self.config.get('plex', {})
 
+    def get_server_config(self):
+        """Get API server tuning options from config"""
+        return self.config.get('server', {}) or {}
+
     def get_channels(self):
         """Get list of channels from config"""
-        return self.config.get('channels', [])
-    
+        return self.config.get('channels', []) or []
+
     def get_playlist_for_channel(self, channel_name):
         """Get playlist name for a specific channel"""
-        for channel in self.get_channels():
-            if channel['name'] == channel_name:
-                return channel['playlist']
-        return None
+        channel = self.channels_by_name.get(channel_name)
+        return channel['playlist'] if channel else None
 
     def get_playback_mode_for_channel(self, channel_name):
         """Get playback mode for a specific channel (shuffle or sequential)"""
-        for channel in self.get_channels():
-            if channel['name'] == channel_name:
-                playback = channel.get('playback', 'shuffle')  # Default to shuffle
-                return self.validate_playback_mode(playback)
-        return 'shuffle'  # Default fallback
+        channel = self.channels_by_name.get(channel_name)
+        return channel['playback'] if channel else 'shuffle'  # Default fallback
 
     def validate_playback_mode(self, playback_mode):
         """Validate and normalize playback mode"""
@@ -64,13 +88,17 @@ class Config:
             return 'shuffle'
 
     def validate_all_channels(self):
-        """Validate all channels and their playback modes"""
-        channels = self.get_channels()
+        """Get all valid channels with normalized playback modes (validated once per load)"""
+        return self.channels
+
+    def build_channel_index(self, config):
+        """Validate the channels in a config and index them by position and by name"""
+        channels = config.get('channels', []) or []
         validated_channels = []
         
         for channel in channels:
             # Validate required fields
-            if 'name' not in channel or 'playlist' not in channel:
+            if not isinstance(channel, dict) or 'name' not in channel or 'playlist' not in channel:
                 print(f"Error: Channel missing required fields (name/playlist): {channel}")
                 continue
             
@@ -89,7 +117,46 @@ class Config:
             elif original_playback != validated_playback:
                 print(f"Channel '{channel['name']}': Corrected playback mode from '{original_playback}' to '{validated_playback}'")
         
-        return validated_channels
+        channels_by_name = {channel['name']: channel for channel in validated_channels}
+        return validated_channels, channels_by_name
+
+    def reload_if_changed(self):
+        """
+        Reload the config file if it changed on disk. Returns True if a new
+        config was loaded; on a read or parse error the current config is kept.
+        """
+        mtime = self.get_mtime()
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+
+        try:
+            new_config = self.read_config_file()
+        except (OSError, yaml.YAMLError) as e:
+            print(f"Error reloading config file {self.config_file}, keeping current config: {e}")
+            return False
+
+        channels, channels_by_name = self.build_channel_index(new_config)
+        self.config, self.channels, self.channels_by_name = new_config, channels, channels_by_name
+        print(f"Reloaded config file {self.config_file}")
+        return True
+
+    def watch(self, on_change, interval=5):
+        """Poll the config file's mtime in a background thread and call on_change after a reload"""
+        if self._watch_thread and self._watch_thread.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self.reload_if_changed():
+                        on_change()
+                except Exception as e:
+                    print(f"Error applying config change: {e}")
+
+        self._watch_thread = threading.Thread(target=run, name='config-watcher', daemon=True)
+        self._watch_thread.start()
 
 # Usage example
 if __name__ == "__main__":
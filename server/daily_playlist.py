@@ -1,50 +1,529 @@
-from plexapi.server import PlexServer
+from array import array
+import bisect
+import copy
 import datetime
+import hashlib
 import random
+import threading
+import time
+import metrics
+import schedule_snapshot
+from track_record import records_from_plex
+
+FETCH_PAGE_SIZE = 500  # Playlist items requested from Plex per page
+TIMELINE_EPOCH_MS = 0  # Chunk boundaries and playlist anchors lie on a grid counted from the Unix epoch
+CHUNK_DURATION = 6 * 60 * 60 * 1000  # The timeline is generated in chunks of about 6 hours
+LOOKAHEAD = 24 * 60 * 60 * 1000  # How far past now the timeline is kept generated
+RETENTION = 60 * 60 * 1000  # How long chunks that have finished airing are kept
+PUBLISH_WAIT = 30  # Seconds a worker waits for the shared timeline writer to publish a new channel
+
+def timeline_ms(when=None):
+    """Convert a local time to milliseconds since the Unix epoch"""
+    when = when or datetime.datetime.now()
+    return int(when.timestamp() * 1000)
+
+def from_timeline_ms(position_ms):
+    """Convert milliseconds since the Unix epoch to a local time"""
+    return datetime.datetime.fromtimestamp(position_ms / 1000)
+
+def source_anchor(updated_at):
+    """
+    Where pass 0 of a version of a source playlist starts: LOOKAHEAD after
+    the first chunk boundary following its last change in Plex. It depends
+    only on the playlist, so every process picks the same anchor, and a
+    process that already generated its timeline with the previous version
+    switches far enough ahead that the change is not visible on air yet.
+    """
+    if updated_at is None:
+        return TIMELINE_EPOCH_MS
+    chunks = -(-(timeline_ms(updated_at) - TIMELINE_EPOCH_MS) // CHUNK_DURATION)
+    return TIMELINE_EPOCH_MS + chunks * CHUNK_DURATION + LOOKAHEAD
+
+def chunk_boundary(position_ms):
+    """Return the first chunk boundary after position_ms"""
+    return TIMELINE_EPOCH_MS + ((position_ms - TIMELINE_EPOCH_MS) // CHUNK_DURATION + 1) * CHUNK_DURATION
+
+def schedule_seed(channel_key, playback_mode, anchor_ms, pass_number):
+    """Derive a stable shuffle seed so every process builds the same timeline"""
+    digest = hashlib.sha256(f"{channel_key}|{playback_mode}|{anchor_ms}|{pass_number}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+class Schedule:
+    """Immutable, ready-to-serve chunk of a channel's timeline"""
+    def __init__(self, items, start_ms, first_sequence=0, next_item=None, creation_time=None, base_url='',
+                 end_ms=None):
+        self.items = tuple(items)
+        self.start_ms = start_ms  # When the first item starts, in ms since the Unix epoch
+        self.first_sequence = first_sequence  # Position of the first item in the channel's timeline
+        self.creation_time = creation_time or datetime.datetime.now()
+        # Response payloads rendered once per chunk rather than on every request
+        self.payloads = tuple(item.render(base_url) for item in self.items)
+        self.next_item = next_item  # First item of the following chunk
+        self.next_payload = next_item.render(base_url) if next_item else None
+
+        # Cumulative start offset of each item in milliseconds
+        start_offsets = array('q')
+        total_duration = 0
+        for item in self.items:
+            start_offsets.append(total_duration)
+            total_duration += item.duration
+        self.start_offsets = start_offsets
+        # end_ms cuts the last airing short, where a changed source playlist takes over
+        self.end_ms = start_ms + total_duration if end_ms is None else end_ms
+        self.total_duration = self.end_ms - start_ms
+
+    def __len__(self):
+        return len(self.items)
+
+    def item_duration(self, index):
+        return self.items[index].duration
+
+    def duration(self, index):
+        """Return how long an item airs in milliseconds; the last one is shorter if the chunk was cut"""
+        if index == len(self) - 1:
+            return self.end_ms - self.start_ms - self.start_offsets[index]
+        return self.item_duration(index)
+
+    def locate(self, position_ms):
+        """Return the index of the item playing at position_ms into the chunk and the offset into it"""
+        index = bisect.bisect_right(self.start_offsets, position_ms) - 1
+        return index, position_ms - self.start_offsets[index]
+
+    def position_at(self, when):
+        """Return (index, offset_ms, started_at) for the track playing at the given time"""
+        index, offset = self.locate(timeline_ms(when) - self.start_ms)
+        return index, offset, self.started_at(index)
+
+    def started_at(self, index):
+        return from_timeline_ms(self.start_ms + self.start_offsets[index])
+
+    def sequence(self, index):
+        """
+        Return the position of an airing counted from its source playlist's
+        anchor; negative before the anchor, and counted again from 0 when the
+        playlist changes
+        """
+        return self.first_sequence + index
+
+    def covers(self, when=None):
+        """Check if this chunk is playing at the given time"""
+        return self.start_ms <= timeline_ms(when) < self.end_ms
+
+    def cut(self, end_ms):
+        """Return a copy of this chunk ending at end_ms, with no following item yet"""
+        schedule = copy.copy(self)
+        schedule.end_ms = end_ms
+        schedule.total_duration = end_ms - self.start_ms
+        schedule.next_item = None
+        schedule.next_payload = None
+        return schedule
+
+    def with_next_item(self, next_item, base_url=''):
+        """Return a copy of this chunk followed by a different item"""
+        schedule = copy.copy(self)
+        schedule.next_item = next_item
+        schedule.next_payload = next_item.render(base_url)
+        return schedule
 
-class DailyPlaylist:
-    def __init__(self, plex, channel_playlist_name, playback_mode='shuffle'):
-        self.plex = plex
-        self.channel_playlist_name = channel_playlist_name
-        self.playback_mode = playback_mode  # 'shuffle' or 'sequential'
-        self.current_playlist = None
-        self.creation_time = datetime.datetime.now()
-        self.playlist_items = None
-        self.refresh_if_needed()
-
-    def generate_playlist(self):
-        """Generate a playlist that is limited to 24 hours long, with optional shuffling"""
-        # Create a copy of the playlist to avoid modifying the original
-        playlist_copy = self.current_playlist.copy()
-        
-        # Apply shuffling based on playback mode
-        if self.playback_mode == 'shuffle':
-            random.shuffle(playlist_copy)
-        # For sequential mode, we keep the original order
-
-        limited_playlist = []
-        # Limit the playlist to 24 hours
-        for item in playlist_copy:
-            total_duration = sum(item.duration for item in limited_playlist)
-            if total_duration < 24 * 60 * 60 * 1000:  # 24 hours in milliseconds
-                limited_playlist.append(item)
-
-        return limited_playlist
-    
-    def is_expired(self):
-        """Check if this playlist is more than 24 hours old"""
-        now = datetime.datetime.now()
-        time_difference = now - self.creation_time
-        return time_difference > datetime.timedelta(hours=24)
-    
     def get_age_hours(self):
-        """Get the age of this playlist in hours"""
+        """Get the age of this chunk in hours"""
         now = datetime.datetime.now()
         time_difference = now - self.creation_time
         return time_difference.total_seconds() / 3600
-    
-    def refresh_if_needed(self):
-        if self.is_expired() or self.playlist_items is None:
-            self.current_playlist = self.plex.playlist(self.channel_playlist_name).items()
-            self.playlist_items = self.generate_playlist()
-            self.creation_time = datetime.datetime.now()
+
+class DailyPlaylist:
+    """
+    A channel's rolling timeline: pass after pass over its source playlist,
+    anchored to an absolute epoch so it plays continuously across midnight and
+    restarts. It is generated lazily in chunks a day ahead of time, and chunks
+    are dropped once they have aired.
+    """
+    def __init__(self, plex, channel_playlist_name, playback_mode='shuffle', warm=True, channel_name=None,
+                 snapshot_dir=None, base_url='', store=None):
+        self.plex = plex  # PlexClient
+        self.base_url = base_url  # Prefix for media links in rendered payloads
+        self.channel_playlist_name = channel_playlist_name
+        self.channel_name = channel_name or channel_playlist_name
+        self.playback_mode = playback_mode  # 'shuffle' or 'sequential'
+        self.current_playlist = None  # Source playlist as TrackRecords
+        self.source_signature = None  # (updatedAt, leafCount, duration) of the fetched source playlist
+        self.source_size = 0  # Number of Plex items the source playlist was built from
+        self.source_last_key = None  # ratingKey of the last Plex item fetched
+        self.source_synced_at = None  # Last time the source playlist was confirmed against Plex
+        self.sync_failed = False  # True while Plex could not be reached to check the source playlist
+        self.anchor_ms = TIMELINE_EPOCH_MS  # Where pass 0 of the current source playlist starts
+        # The version the current source playlist replaced, which airs until anchor_ms
+        self.previous_playlist = None
+        self.previous_anchor_ms = None
+        self._switch_ms = None  # Where the timeline moves on to the current source playlist, while it airs the previous one
+        self.segments = ()  # Generated chunks in airing order, swapped atomically, never mutated
+        self.snapshot_dir = snapshot_dir  # Where the source playlist is persisted, None to disable
+        self.store = store  # ScheduleStore shared with other workers, None to keep the timeline private
+        self._published = None  # PublishedTimeline the segments are mapped from, while another process writes
+        self._writer_term = None  # store.term this timeline was generated under
+        self._waited_for_writer = False
+        self._airings = None  # Timeline iterator positioned after the last generated chunk
+        self._pending = None  # Next (sequence, start_ms, item) from _airings
+        self._refresh_lock = threading.Lock()  # Single-flight Plex syncs
+        self._timeline_lock = threading.Lock()  # Guards _airings while chunks are generated
+        if warm:
+            self.refresh_if_needed()
+
+    def iter_playback_order(self, tracks, anchor_ms, pass_number):
+        """Yield the source playlist's items in playback order for one pass of the timeline"""
+        if self.playback_mode != 'shuffle':
+            # For sequential mode, we keep the original order
+            yield from tracks
+            return
+
+        # Incremental Fisher-Yates shuffle so only the items we consume get drawn.
+        # Seeded per channel and pass so all workers and replicas agree.
+        rng = random.Random(schedule_seed(self.channel_name, self.playback_mode, anchor_ms, pass_number))
+        remaining = list(tracks)
+        for i in range(len(remaining) - 1, -1, -1):
+            j = rng.randint(0, i)
+            remaining[i], remaining[j] = remaining[j], remaining[i]
+            yield remaining[i]
+
+    def iter_timeline(self, tracks, anchor_ms, from_ms):
+        """
+        Yield (sequence, start_ms, item) for every airing from the one playing
+        at from_ms on. Each pass over the source playlist lasts exactly its
+        total duration, so the pass playing at any time is found directly and
+        only that pass is walked to reach from_ms.
+        """
+        pass_duration = sum(item.duration for item in tracks)
+        pass_number = (from_ms - anchor_ms) // pass_duration
+        start = anchor_ms + pass_number * pass_duration
+        while True:
+            for index, item in enumerate(self.iter_playback_order(tracks, anchor_ms, pass_number)):
+                end = start + item.duration
+                if end > from_ms:
+                    yield pass_number * len(tracks) + index, start, item
+                start = end
+            pass_number += 1
+
+    def start_timeline(self, anchor_ms, from_ms):
+        """
+        Position the timeline at from_ms: on the previous source playlist if
+        from_ms is before the current one's anchor, otherwise on the current
+        one. Called with _timeline_lock held.
+        """
+        self.anchor_ms = anchor_ms
+        if self.previous_playlist and from_ms < anchor_ms:
+            tracks, tracks_anchor_ms, self._switch_ms = self.previous_playlist, self.previous_anchor_ms, anchor_ms
+        else:
+            tracks, tracks_anchor_ms, self._switch_ms = self.current_playlist, anchor_ms, None
+        if not tracks:
+            raise ValueError(f"Playlist '{self.channel_playlist_name}' has no playable tracks")
+        self._airings = self.iter_timeline(tracks, tracks_anchor_ms, from_ms)
+        self._pending = next(self._airings)
+
+    def generate_chunk(self):
+        """
+        Generate the next chunk: every airing that starts before the next chunk
+        boundary, so all processes cut chunks at the same tracks. A chunk that
+        reaches the switch from the previous source playlist to the current
+        one is cut there. Called with _timeline_lock held.
+        """
+        first_sequence, start_ms, item = self._pending
+        boundary = chunk_boundary(start_ms)
+        items = []
+        while self._pending[1] < boundary:
+            items.append(self._pending[2])
+            self._pending = next(self._airings)
+        if self._switch_ms is not None and boundary >= self._switch_ms:
+            end_ms = self._switch_ms
+            self.start_timeline(self.anchor_ms, end_ms)
+            return Schedule(items, start_ms, first_sequence, self._pending[2], base_url=self.base_url, end_ms=end_ms)
+        return Schedule(items, start_ms, first_sequence, self._pending[2], base_url=self.base_url)
+
+    def extend_timeline(self, until_ms, now_ms=None):
+        """Generate chunks until the timeline reaches until_ms and drop chunks that aired before the retention window"""
+        now_ms = now_ms or timeline_ms()
+        with self._timeline_lock:
+            segments = [segment for segment in self.segments if segment.end_ms > now_ms - RETENTION]
+            if self._airings is None:
+                return
+            if segments and segments[-1].end_ms != self._pending[1]:
+                # The timeline was restarted, e.g. on taking over as the shared writer or after a late playlist switch
+                segments = []
+            elif segments and segments[-1].next_item is not self._pending[2]:
+                # A new source playlist took over after the last chunk
+                segments[-1] = segments[-1].with_next_item(self._pending[2], self.base_url)
+            with metrics.GENERATE_DURATION.time(self.channel_name):
+                while not segments or segments[-1].end_ms < until_ms:
+                    segments.append(self.generate_chunk())
+            self.segments = tuple(segments)
+            self._published = None
+            self.publish()
+
+    def is_ready(self):
+        """Check if a schedule has been built and can be served"""
+        return bool(self.segments)
+
+    def get_schedule(self, when=None):
+        """Return the chunk playing at the given time, generating it if the timeline has not reached it yet"""
+        position_ms = timeline_ms(when)
+        segments = self.segments
+        if segments and position_ms >= segments[-1].end_ms:
+            if self.store is not None and not self.store.is_writer():
+                self.load_published()
+            else:
+                self.extend_timeline(position_ms + 1)
+            segments = self.segments
+        for segment in segments:
+            if segment.start_ms <= position_ms < segment.end_ms:
+                return segment
+        return None
+
+    def iter_airings(self, start):
+        """
+        Yield (schedule, index, started_at, ended_at) for each track airing,
+        beginning with the one playing at start and running to the end of the
+        generated timeline.
+        """
+        start_ms = timeline_ms(start)
+        for segment in self.segments:
+            if segment.end_ms <= start_ms:
+                continue
+            first = segment.locate(start_ms - segment.start_ms)[0] if start_ms > segment.start_ms else 0
+            for index in range(first, len(segment)):
+                started_ms = segment.start_ms + segment.start_offsets[index]
+                ended_ms = started_ms + segment.duration(index)
+                yield segment, index, from_timeline_ms(started_ms), from_timeline_ms(ended_ms)
+
+    def needs_extension(self, until_ms):
+        """Check if the timeline does not reach until_ms yet"""
+        segments = self.segments
+        return not segments or segments[-1].end_ms < until_ms
+
+    def get_age_hours(self):
+        """Get the hours since the source playlist was last confirmed against Plex"""
+        synced_at = self.source_synced_at
+        if synced_at is None:
+            return 0.0
+        return (datetime.datetime.now() - synced_at).total_seconds() / 3600
+
+    def refresh_if_needed(self, lead_time=datetime.timedelta(0)):
+        """
+        Keep the timeline generated LOOKAHEAD (plus lead_time) ahead of now.
+        The source playlist is loaded on first use and checked against Plex
+        each time a chunk is added; a changed playlist takes over at its
+        anchor (see source_anchor).
+        """
+        if self.store is not None and not self.store.acquire_writer():
+            # Another worker generates this channel's timeline; serve what it published,
+            # waiting for it once while this channel warms up
+            wait = not self.segments and not self._waited_for_writer
+            self._waited_for_writer = True
+            self.load_published(wait)
+            return
+
+        now_ms = timeline_ms()
+        until_ms = now_ms + LOOKAHEAD + int(lead_time.total_seconds() * 1000)
+        if not self.needs_extension(until_ms):
+            return
+
+        # Concurrent callers wait for the in-flight refresh instead of starting their own
+        with self._refresh_lock:
+            if not self.needs_extension(until_ms):
+                return
+            if self.store is not None and self._writer_term != self.store.term:
+                # Newly the writer: restart from the snapshot the previous writer kept up to date
+                self._writer_term = self.store.term
+                self._airings = None
+            try:
+                with metrics.REFRESH_DURATION.time(self.channel_name):
+                    if self._airings is None:
+                        self.load_source(now_ms)
+                    else:
+                        self.sync_source(now_ms)
+                    self.extend_timeline(until_ms, now_ms)
+                if self.previous_playlist is not None and self.anchor_ms <= now_ms - RETENTION:
+                    self.previous_playlist = self.previous_anchor_ms = None  # It has finished airing
+            except Exception:
+                metrics.REFRESHES.inc(self.channel_name, 'error')
+                raise
+            metrics.REFRESHES.inc(self.channel_name, 'success')
+
+    def load_source(self, now_ms):
+        """Load the source playlist from the snapshot, or from Plex, and start the timeline at now"""
+        if not self.load_snapshot():
+            self.update_source_playlist()
+            self.save_snapshot()
+        with self._timeline_lock:
+            self.start_timeline(self.anchor_ms, now_ms - RETENTION)
+
+    def sync_source(self, now_ms):
+        """Check the source playlist against Plex and switch to it at its anchor if it changed"""
+        outgoing = (self.current_playlist, self.anchor_ms)
+        try:
+            changed = self.update_source_playlist()
+        except Exception as e:
+            # Keep extending the timeline from the playlist we already have
+            self.sync_failed = True
+            print(f"Could not check playlist '{self.channel_playlist_name}', keeping the current one: {e}")
+            return
+        if changed:
+            self.switch_source(outgoing, now_ms)
+            self.save_snapshot()
+
+    def switch_source(self, outgoing, now_ms):
+        """
+        Make the changed source playlist take over at its anchor. Until then
+        the version on air now keeps airing as the previous playlist: the
+        outgoing (tracks, anchor), or the previous playlist it was itself
+        going to replace if that switch hasn't come yet. The timeline is then
+        rebuilt from these two versions alone, exactly as a process restarting
+        from the snapshot builds it, so both play the same tracks, including
+        the one on air now. If the anchor has already passed, e.g. after Plex
+        was unreachable for a day, the new playlist takes over straight away.
+        """
+        outgoing_tracks, outgoing_anchor_ms = outgoing
+        if self.anchor_ms <= now_ms:
+            print(f"Playlist '{self.channel_playlist_name}' changed before its switch point, restarting its timeline")
+            self.previous_playlist = self.previous_anchor_ms = None
+        elif self.previous_playlist is None or outgoing_anchor_ms <= now_ms:
+            self.previous_playlist, self.previous_anchor_ms = outgoing_tracks, outgoing_anchor_ms
+        with self._timeline_lock:
+            # extend_timeline drops the old chunks, which no longer join up with the rebuilt timeline
+            self.start_timeline(self.anchor_ms, now_ms - RETENTION)
+
+    def update_source_playlist(self):
+        """
+        Bring current_playlist up to date with Plex and return True if it changed.
+        The playlist's metadata is checked first and the items are only fetched
+        when it changed; if items were only appended, just the new tail is
+        fetched and merged.
+        """
+        playlist = self.plex.playlist(self.channel_playlist_name)
+        signature = (str(playlist.updatedAt), playlist.leafCount, playlist.duration)
+        self.source_synced_at = datetime.datetime.now()
+        self.sync_failed = False
+        if self.current_playlist is not None and signature == self.source_signature:
+            metrics.CACHE_REQUESTS.inc('source_playlist', 'hit')
+            return False
+        metrics.CACHE_REQUESTS.inc('source_playlist', 'miss')
+
+        items_key = f"{playlist.key}/items"
+        leaf_count = playlist.leafCount or 0
+        if self.current_playlist is not None and self.source_size and leaf_count > self.source_size \
+                and self.is_source_prefix_unchanged(items_key):
+            records, fetched, last_key = self.fetch_records(items_key, start=self.source_size)
+            self.current_playlist = self.current_playlist + records
+            self.source_size += fetched
+            print(f"Merged {len(records)} new tracks into '{self.channel_playlist_name}'")
+        else:
+            records, fetched, last_key = self.fetch_records(items_key)
+            self.current_playlist = records
+            self.source_size = fetched
+        self.source_last_key = last_key or self.source_last_key
+        self.source_signature = signature
+        self.anchor_ms = source_anchor(playlist.updatedAt)
+        return True
+
+    def is_source_prefix_unchanged(self, items_key):
+        """Check that the last item we fetched is still at the same position in the playlist"""
+        page = self.plex.fetch_items(items_key, self.source_size - 1, 1)
+        return bool(page) and page[0].ratingKey == self.source_last_key
+
+    def fetch_records(self, items_key, start=0):
+        """
+        Fetch playlist items page by page from start, converting each page to
+        TrackRecords so only one page of plexapi objects is alive at a time.
+        Returns (records, number of Plex items fetched, ratingKey of the last item).
+        """
+        records = []
+        fetched = 0
+        last_key = None
+        while True:
+            page = self.plex.fetch_items(items_key, start + fetched, FETCH_PAGE_SIZE)
+            if not page:
+                break
+            records.extend(records_from_plex(page))
+            fetched += len(page)
+            last_key = page[-1].ratingKey
+            if len(page) < FETCH_PAGE_SIZE:
+                break
+        return records, fetched, last_key
+
+    def load_published(self, wait=False):
+        """
+        Switch to the newest timeline the writer process published. With wait,
+        give a writer that is still warming up PUBLISH_WAIT seconds to publish.
+        """
+        deadline = time.monotonic() + (PUBLISH_WAIT if wait else 0)
+        while True:
+            published = self.store.load(self, self._published)
+            if published is not None or time.monotonic() >= deadline:
+                break
+            time.sleep(0.5)
+        if published is None:
+            return
+        self.source_synced_at = published.synced_at
+        self.sync_failed = published.sync_failed
+        self._published = published
+        self.segments = published.segments
+
+    def publish(self):
+        """Publish the generated timeline for the other workers, if the store is shared"""
+        if self.store is None:
+            return
+        try:
+            self.store.publish(self)
+        except OSError as e:
+            print(f"Could not publish the timeline for '{self.channel_name}': {e}")
+
+    def load_snapshot(self):
+        """Restore the source playlists and their anchors from a snapshot; return True if one was valid"""
+        if not self.snapshot_dir:
+            return False
+        snapshot = schedule_snapshot.load_snapshot(
+            self.snapshot_dir, self.channel_name, self.channel_playlist_name, self.playback_mode
+        )
+        if snapshot is None:
+            metrics.CACHE_REQUESTS.inc('snapshot', 'miss')
+            return False
+        try:
+            tracks, header, previous_tracks = snapshot
+            self.anchor_ms = int(header['anchor'])
+            previous_anchor_ms = int(header['previous_anchor']) if previous_tracks else None
+            self.source_signature = tuple(header['signature'])
+            self.source_size = int(header['source_size'])
+            self.source_last_key = header.get('source_last_key')
+            self.source_synced_at = datetime.datetime.fromisoformat(header['synced'])
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Ignoring incomplete schedule snapshot for '{self.channel_name}': {e}")
+            metrics.CACHE_REQUESTS.inc('snapshot', 'miss')
+            return False
+        metrics.CACHE_REQUESTS.inc('snapshot', 'hit')
+        self.current_playlist = tracks
+        self.previous_playlist, self.previous_anchor_ms = previous_tracks or None, previous_anchor_ms
+        print(f"Loaded schedule snapshot for '{self.channel_name}' ({len(tracks)} tracks)")
+        return True
+
+    def save_snapshot(self):
+        """
+        Persist the source playlist and its anchor, plus the previous version
+        while it is still airing, so a restart resumes the same timeline
+        without contacting Plex
+        """
+        if not self.snapshot_dir:
+            return
+        state = {
+            "anchor": self.anchor_ms,
+            "previous_anchor": self.previous_anchor_ms,
+            "signature": list(self.source_signature) if self.source_signature else None,
+            "source_size": self.source_size,
+            "source_last_key": self.source_last_key,
+            "synced": (self.source_synced_at or datetime.datetime.now()).isoformat()
+        }
+        try:
+            schedule_snapshot.save_snapshot(
+                self.snapshot_dir, self.channel_name, self.channel_playlist_name, self.playback_mode,
+                self.current_playlist, state, self.previous_playlist or ()
+            )
+            schedule_snapshot.remove_legacy_snapshots(self.snapshot_dir, self.channel_name)
+        except OSError as e:
+            print(f"Could not save schedule snapshot for '{self.channel_name}': {e}")
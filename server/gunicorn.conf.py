@@ -0,0 +1,36 @@
+"""
+Gunicorn settings for Plex Radio API
+
+    gunicorn --config server/gunicorn.conf.py server.run:app
+
+Set PLEX_RADIO_PRELOAD=1 (or pass --preload) to build every channel's schedule
+once in the master before the workers are forked. Workers then share that
+memory copy-on-write instead of each fetching and generating its own schedules.
+Plex is only contacted by the master at startup; each worker opens its own
+connections. Either way, the master never runs the background threads.
+"""
+import os
+
+bind = '0.0.0.0:5000'
+worker_class = 'gthread'
+# Long-poll and SSE listeners each hold a thread. At most max_held_connections
+# (default 16) do, so the rest stay free for short requests such as /health;
+# beyond that, listeners get a 503. Use run_asgi.py for many more listeners.
+threads = 32
+# Worker count comes from gunicorn's own WEB_CONCURRENCY variable (default 1)
+preload_app = os.environ.get('PLEX_RADIO_PRELOAD', '').lower() in ('1', 'true', 'yes')
+
+# The app is loaded after this file, possibly in the master, and only then is
+# --preload known; leave starting the background threads to the hooks below
+os.environ['PLEX_RADIO_GUNICORN_HOOKS'] = '1'
+
+def when_ready(server):
+    """Runs in the master once the app is loaded, before any worker is forked"""
+    if server.cfg.preload_app:
+        import plex_radio_api  # Already imported by the preloaded app
+        plex_radio_api.prepare_fork()
+
+def post_worker_init(worker):
+    """Background threads don't survive fork, so each worker starts its own once the app is loaded"""
+    import plex_radio_api  # Already imported by run.py
+    plex_radio_api.start_background_tasks()
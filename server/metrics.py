@@ -0,0 +1,181 @@
+"""
+Minimal in-process metrics rendered in the Prometheus text exposition format.
+Recording a value is a lock plus a few integer updates, so instrumenting hot
+paths adds negligible overhead. Metrics are per process: with several Gunicorn
+workers each worker reports its own values.
+
+Histograms given a server_timing name also add their timings to the current
+request's Server-Timing header, when the request thread is collecting them.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+_request_timings = threading.local()
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + '}'
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def start_server_timings():
+    """Start collecting Server-Timing entries for the request handled by this thread"""
+    _request_timings.entries = {}
+
+def finish_server_timings():
+    """Stop collecting and return the Server-Timing header value, or None if nothing was timed"""
+    entries = getattr(_request_timings, 'entries', None)
+    _request_timings.entries = None
+    if not entries:
+        return None
+    return ', '.join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in entries.items())
+
+def record_server_timing(name, seconds):
+    """Add time to this thread's Server-Timing entry, if a request is collecting them"""
+    entries = getattr(_request_timings, 'entries', None)
+    if entries is not None:
+        entries[name] = entries.get(name, 0.0) + seconds
+
+@contextmanager
+def server_timing(name):
+    """Add the wall time spent in the with-block to the Server-Timing header"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_server_timing(name, time.perf_counter() - start)
+
+class Registry:
+    """Collection of metrics that can be rendered together"""
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}" for labels, value in values]
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, server_timing=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.server_timing = server_timing  # Server-Timing entry name, None to leave it out
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, *labelvalues):
+        """Observe the wall time spent in the with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(elapsed, *labelvalues)
+            if self.server_timing:
+                record_server_timing(self.server_timing, elapsed)
+
+    def samples(self):
+        with self._lock:
+            series = [(labels, list(values)) for labels, values in self._series.items()]
+        lines = []
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, labels, [('le', format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(values[-2])}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {values[-1]}")
+        return lines
+
+class CallbackGauge:
+    """Gauge whose samples are computed at scrape time by a callback returning (labelvalues, value) pairs"""
+    type = 'gauge'
+
+    def __init__(self, name, help, labelnames=(), callback=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def samples(self):
+        if self.callback is None:
+            return []
+        return [f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}"
+                for labels, value in self.callback()]
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    'plex_radio_request_duration_seconds', 'HTTP request latency by route', ('route', 'status')))
+TRACK_LOOKUP_DURATION = REGISTRY.register(Histogram(
+    'plex_radio_track_lookup_duration_seconds', 'Time to locate the current track in a schedule',
+    server_timing='lookup'))
+REFRESH_DURATION = REGISTRY.register(Histogram(
+    'plex_radio_refresh_duration_seconds', 'Time to build a channel schedule', ('channel',),
+    server_timing='refresh'))
+GENERATE_DURATION = REGISTRY.register(Histogram(
+    'plex_radio_generate_playlist_duration_seconds', 'Time to generate timeline chunks', ('channel',),
+    server_timing='generate'))
+PLEX_FETCH_DURATION = REGISTRY.register(Histogram(
+    'plex_radio_plex_fetch_duration_seconds', 'Latency of Plex requests', ('operation',),
+    server_timing='plex'))
+PLEX_REQUESTS = REGISTRY.register(Counter(
+    'plex_radio_plex_requests_total', 'Plex calls by operation and result (success, retry, error, coalesced)',
+    ('operation', 'result')))
+REFRESHES = REGISTRY.register(Counter(
+    'plex_radio_refreshes_total', 'Schedule builds by channel and result', ('channel', 'result')))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'plex_radio_cache_requests_total', 'Cache lookups by cache and result (hit or miss)', ('cache', 'result')))
@@ -0,0 +1,38 @@
+import datetime
+import threading
+
+class PlaylistRefresher:
+    """Background thread that keeps each channel's timeline generated ahead of time"""
+    def __init__(self, playlists, interval=60, lead_time=datetime.timedelta(minutes=15)):
+        self.playlists = playlists
+        self.interval = interval  # Seconds between expiry checks
+        self.lead_time = lead_time  # Extra time the timeline is generated ahead, on top of LOOKAHEAD
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the refresher thread if it is not already running"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run, name='playlist-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the refresher thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.refresh_all()
+
+    def refresh_all(self):
+        """Extend every playlist whose timeline ends within the lead time"""
+        for playlist in list(self.playlists):
+            try:
+                playlist.refresh_if_needed(self.lead_time)
+            except Exception as e:
+                # Keep serving the generated timeline and retry on the next pass
+                print(f"Error refreshing playlist '{playlist.channel_playlist_name}': {e}")
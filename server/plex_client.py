@@ -0,0 +1,178 @@
+import os
+import random
+import threading
+import time
+import weakref
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+
+# plexapi takes a noticeable time to import, so it is only imported on the first Plex call
+
+class PlexNotFound(Exception):
+    """Plex answered, but the requested playlist or item does not exist"""
+
+# Errors that mean Plex answered, so they do not count against its circuit breaker
+EXPECTED_ERRORS = (PlexNotFound,)
+
+# Clients whose connections are dropped in a forked child (e.g. gunicorn --preload workers)
+_clients = weakref.WeakSet()
+
+def _reset_clients_after_fork():
+    for client in list(_clients):
+        client.reset_connections()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_clients_after_fork)
+
+class SingleFlight:
+    """Lets concurrent identical calls share one execution and its result"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> in-flight call: {'done': Event, 'result': ..., 'error': ...}
+
+    def do(self, key, function):
+        """Run function, or wait for the identical call already running; return (result, shared)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result'], True
+
+        try:
+            call['result'] = function()
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+        return call['result'], False
+
+def is_retryable(error):
+    """Connection problems, timeouts and 5xx responses are worth retrying; other errors are not"""
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    from plexapi.exceptions import BadRequest
+    # plexapi reports every other unexpected status as BadRequest('(<status>) ...')
+    return isinstance(error, BadRequest) and str(error).startswith('(5')
+
+def is_not_found(error):
+    from plexapi.exceptions import NotFound
+    return isinstance(error, NotFound)
+
+class PlexClient:
+    """
+    The single way the API talks to Plex. Calls share a pooled HTTP session,
+    at most max_concurrency run at once, each has a timeout and is retried
+    with jittered backoff on transient errors, and identical concurrent calls
+    are coalesced into one upstream request. The optional circuit breaker
+    makes calls fail fast while Plex is down. The server is connected on
+    first use, so Plex being down does not stop the API from starting, and a
+    forked child process opens its own connections instead of sharing the
+    parent's sockets.
+    """
+    def __init__(self, baseurl, token, timeout=30, retries=2, backoff=0.5, max_concurrency=4, breaker=None):
+        self.baseurl = baseurl
+        self.token = token
+        self.timeout = timeout  # Seconds per HTTP request
+        self.retries = retries  # Extra attempts after a transient failure
+        self.backoff = backoff  # Base delay in seconds; attempt n waits up to backoff * 2**n
+        self.breaker = breaker
+        self.max_concurrency = max_concurrency
+        self.reset_connections()
+        _clients.add(self)
+
+    def reset_connections(self):
+        """Start over with a fresh session and no connected server"""
+        self.session = self.create_session(self.max_concurrency)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._single_flight = SingleFlight()
+        self._server = None
+        self._connect_lock = threading.Lock()
+
+    @staticmethod
+    def create_session(pool_size):
+        """Build a keep-alive session whose connection pool matches the concurrency limit"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def server(self, connect_timeout=None):
+        """Return the connected PlexServer, connecting on first use (within connect_timeout if given)"""
+        server = self._server
+        if server is None:
+            with self._connect_lock:
+                if self._server is None:
+                    from plexapi.server import PlexServer
+                    connected = PlexServer(
+                        self.baseurl, self.token, session=self.session, timeout=connect_timeout or self.timeout
+                    )
+                    # plexapi keeps the connect timeout for every later request, so restore ours
+                    connected._timeout = self.timeout
+                    self._server = connected
+                server = self._server
+        return server
+
+    def call(self, operation, key, function):
+        """Run one Plex operation with coalescing, the circuit breaker, bounded concurrency and retries"""
+        def guarded():
+            if self.breaker is None:
+                return self.with_retries(operation, function)
+            return self.breaker.call(self.with_retries, operation, function)
+
+        result, shared = self._single_flight.do((operation, key), guarded)
+        if shared:
+            metrics.PLEX_REQUESTS.inc(operation, 'coalesced')
+        return result
+
+    def with_retries(self, operation, function):
+        """Call function(server) in a concurrency slot, retrying transient errors"""
+        attempt = 0
+        while True:
+            try:
+                with self._slots, metrics.PLEX_FETCH_DURATION.time(operation):
+                    result = function(self.server())
+                metrics.PLEX_REQUESTS.inc(operation, 'success')
+                return result
+            except Exception as e:
+                if attempt >= self.retries or not is_retryable(e):
+                    metrics.PLEX_REQUESTS.inc(operation, 'error')
+                    if is_not_found(e):
+                        raise PlexNotFound(str(e)) from e
+                    raise
+                metrics.PLEX_REQUESTS.inc(operation, 'retry')
+                # Full jitter keeps workers that failed together from retrying together
+                time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+                attempt += 1
+
+    def playlist(self, title):
+        """Fetch a playlist's metadata by title"""
+        return self.call('playlist', title, lambda server: server.playlist(title))
+
+    def fetch_items(self, key, start, size):
+        """Fetch one page of a container's items"""
+        return self.call(
+            'items', (key, start, size),
+            lambda server: server.fetchItems(key, container_start=start, container_size=size, maxresults=size)
+        )
+
+    def probe(self, timeout):
+        """
+        Make one cheap request to check Plex is reachable. Probes bypass the
+        breaker, retries and concurrency limit: they are what tells the breaker
+        that Plex is back.
+        """
+        with metrics.PLEX_FETCH_DURATION.time('probe'):
+            if self._server is None:
+                self.server(connect_timeout=timeout)
+            else:
+                self._server.query('/', timeout=timeout)
@@ -0,0 +1,73 @@
+import datetime
+import threading
+import time
+
+class PlexHealthMonitor:
+    """
+    Background thread that probes Plex on an interval and caches the result,
+    so health checks never wait on Plex. Probe results also feed the circuit
+    breaker, which lets a recovered Plex close the circuit without waiting for
+    the next playlist refresh.
+    """
+    def __init__(self, probe, breaker, interval=30):
+        self.probe = probe  # Callable that raises if Plex cannot be reached
+        self.breaker = breaker
+        self.interval = interval  # Seconds between probes
+        self.reachable = None  # None until the first probe completes
+        self.last_check = None
+        self.last_success = None
+        self.last_error = None
+        self.latency = None  # Seconds taken by the last probe
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the monitor thread if it is not already running"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run, name='plex-health-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the monitor thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def run(self):
+        self.check()
+        while not self._stop_event.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """Probe Plex once and record the outcome"""
+        start = time.perf_counter()
+        try:
+            self.probe()
+        except Exception as e:
+            if self.reachable is not False:
+                print(f"Plex server unreachable: {e}")
+            self.breaker.record_failure()
+            self.reachable = False
+            self.last_error = str(e)
+        else:
+            if self.reachable is False:
+                print("Plex server reachable again")
+            self.breaker.record_success()
+            self.reachable = True
+            self.last_error = None
+            self.last_success = datetime.datetime.now()
+        self.latency = time.perf_counter() - start
+        self.last_check = datetime.datetime.now()
+
+    def status(self):
+        """Return the cached probe result as a JSON-ready dict"""
+        return {
+            "reachable": self.reachable,
+            "circuit": self.breaker.state,
+            "last_check": self.last_check.isoformat() if self.last_check else None,
+            "last_success": self.last_success.isoformat() if self.last_success else None,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error": self.last_error
+        }
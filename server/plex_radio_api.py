@@ -1,140 +1,452 @@
-from flask import Flask, jsonify
-from plexapi.server import PlexServer
+from flask import Flask, jsonify, request, Response, g
+from concurrent.futures import ThreadPoolExecutor
 import datetime
+import circuit_breaker
 import config
+import gc
+import json
+import metrics
+import plex_client
+import time
 import daily_playlist
-from unidecode import unidecode
+import playlist_refresher
+import profiler
+import schedule_store
+import plex_health_monitor
+import track_notifier
+import threading
 import os
 
 app = Flask(__name__)
 
-# Use the correct config file path
-config_path = os.path.join(os.path.dirname(__file__), 'configuration', 'plex_radio_config.yaml')
+# Use the correct config file path (PLEX_RADIO_CONFIG overrides it, e.g. for benchmarks)
+config_path = os.environ.get('PLEX_RADIO_CONFIG') or os.path.join(
+    os.path.dirname(__file__), 'configuration', 'plex_radio_config.yaml'
+)
 current_config = config.Config(config_path)
 
 # Plex server configuration
 plex_config = current_config.get_plex_config()
 BASEURL = plex_config.get('host', 'http://localhost:32400')
 TOKEN = plex_config.get('token', 'YOUR_DEFAULT_TOKEN')
-plex = PlexServer(BASEURL, TOKEN)
+
+# Startup warm-up configuration
+# Set by gunicorn.conf.py, whose hooks start the background tasks in each worker
+# and call prepare_fork() in a preloading master, so create_app leaves both to them
+GUNICORN_HOOKS = os.environ.get('PLEX_RADIO_GUNICORN_HOOKS') == '1'
+server_config = current_config.get_server_config()
+WARMUP_WORKERS = max(1, int(server_config.get('warmup_workers', 4)))
+LAZY_WARMUP = bool(server_config.get('lazy_warmup', False))
+DEBUG_LOGGING = bool(server_config.get('debug_logging', False))
+WATCH_CONFIG = bool(server_config.get('watch_config', True))
+SERVER_TIMING = bool(server_config.get('server_timing', True))
+PROFILING = bool(server_config.get('profiling', False)) or \
+    os.environ.get('PLEX_RADIO_PROFILING', '').lower() in ('1', 'true', 'yes')
+HEALTH_CHECK_INTERVAL = max(1, int(server_config.get('health_check_interval', 30)))
+PLEX_FAILURE_THRESHOLD = max(1, int(server_config.get('plex_failure_threshold', 3)))
+PLEX_RETRY_AFTER = max(1, int(server_config.get('plex_retry_after', 30)))
+PLEX_TIMEOUT = max(1, int(server_config.get('plex_timeout', 30)))
+PLEX_RETRIES = max(0, int(server_config.get('plex_retries', 2)))
+PLEX_MAX_CONCURRENCY = max(1, int(server_config.get('plex_max_concurrency', 4)))
+PLEX_PROBE_TIMEOUT = 5  # Seconds before a background Plex probe counts as failed
+MAX_LONG_POLL_WAIT = 300  # Seconds a ?wait= request may be held open
+# SSE streams and long-polls each hold a worker thread; keep this below gunicorn's threads
+MAX_HELD_CONNECTIONS = max(1, int(server_config.get('max_held_connections', 16)))
+SSE_KEEPALIVE_INTERVAL = 15  # Seconds between SSE keep-alive comments
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+DEFAULT_SCHEDULE_COUNT = 20  # Tracks returned by /schedule when no count or range is given
+MAX_SCHEDULE_COUNT = 10000  # Upper bound on tracks per channel in one /schedule response
+
+# Schedule snapshots let a restart reuse today's schedule without contacting Plex
+DATA_DIR = os.path.join(os.path.dirname(__file__), server_config.get('data_dir', 'data'))
+SNAPSHOT_DIR = DATA_DIR if server_config.get('snapshots', True) else None
+
+# With shared schedules one worker generates every timeline and the others map it from DATA_DIR
+shared_store = schedule_store.ScheduleStore(DATA_DIR) if server_config.get('shared_schedules', False) else None
+
+# Profiles captured through /debug/profile are written under DATA_DIR
+request_profiler = profiler.RequestProfiler(os.path.join(DATA_DIR, 'profiles')) if PROFILING else None
 
 channel_playlists = []
+startup_warmup = None  # Executor fetching the channels at startup, see prepare_fork
+refresher = playlist_refresher.PlaylistRefresher(channel_playlists)
+
+# Plex calls fail fast while Plex is down; channels keep serving their last good schedule
+plex_breaker = circuit_breaker.CircuitBreaker(
+    'Plex server',
+    failure_threshold=PLEX_FAILURE_THRESHOLD,
+    reset_timeout=PLEX_RETRY_AFTER,
+    excluded_exceptions=plex_client.EXPECTED_ERRORS  # A missing playlist still means Plex answered
+)
+
+# Every Plex call goes through this client: pooled connections, timeouts, retries and coalescing
+plex = plex_client.PlexClient(
+    BASEURL,
+    TOKEN,
+    timeout=PLEX_TIMEOUT,
+    retries=PLEX_RETRIES,
+    max_concurrency=PLEX_MAX_CONCURRENCY,
+    breaker=plex_breaker
+)
+
+def probe_plex():
+    """Cheap Plex request used by the background health monitor"""
+    plex.probe(PLEX_PROBE_TIMEOUT)
+
+plex_monitor = plex_health_monitor.PlexHealthMonitor(
+    probe_plex,
+    plex_breaker,
+    interval=HEALTH_CHECK_INTERVAL
+)
+
+track_notifiers = {}
+held_connections = threading.BoundedSemaphore(MAX_HELD_CONNECTIONS)
+app_started = False
+app_lock = threading.Lock()
 
-def generate_daily_playlists():
+def warm_playlist(playlist):
+    """Build the first schedule for a channel, leaving it warming on failure"""
+    try:
+        playlist.refresh_if_needed()
+    except Exception as e:
+        # The background refresher retries channels that have no schedule yet
+        print(f"Error warming playlist '{playlist.channel_playlist_name}': {e}")
+
+def create_daily_playlist(channel):
+    """Create an unwarmed DailyPlaylist for a validated channel definition"""
+    return daily_playlist.DailyPlaylist(
+        plex, 
+        channel['playlist'], 
+        channel['playback'],  # Already validated
+        warm=False,
+        channel_name=channel['name'],
+        snapshot_dir=SNAPSHOT_DIR,
+        store=shared_store,
+        base_url=BASEURL
+    )
+
+def warm_playlists(playlists, wait=True):
+    """Fetch the given channels' playlists in parallel on a bounded thread pool"""
+    executor = ThreadPoolExecutor(
+        max_workers=min(WARMUP_WORKERS, max(1, len(playlists))),
+        thread_name_prefix='playlist-warmup'
+    )
+    for playlist in playlists:
+        executor.submit(warm_playlist, playlist)
+    executor.shutdown(wait=wait)
+    return executor
+
+def generate_daily_playlists(wait=True):
     """
     Generate daily playlists for each channel based on the current playlist.
+    Channel playlists are fetched in parallel; with wait=False this returns
+    immediately and channels report "warming" until they are ready.
     """
-    channel_playlists.clear()  # Clear existing playlists
+    global startup_warmup
+    channel_playlists[:] = [create_daily_playlist(channel) for channel in current_config.validate_all_channels()]
+    startup_warmup = warm_playlists(channel_playlists, wait=wait)
 
+def channel_key(playlist):
+    return (playlist.channel_name, playlist.channel_playlist_name, playlist.playback_mode)
+
+def apply_config_changes():
+    """
+    Update the channel list after the config file was reloaded. Channels whose
+    definition is unchanged keep their DailyPlaylist; only new or changed
+    channels are rebuilt, and they report "warming" until ready.
+    """
+    existing = {channel_key(playlist): playlist for playlist in channel_playlists}
+    updated = []
+    created = []
     for channel in current_config.validate_all_channels():
-        playback_mode = channel['playback']  # Already validated
-        daily_playlist_instance = daily_playlist.DailyPlaylist(
-            plex, 
-            channel['playlist'], 
-            playback_mode
-        )
-        channel_playlists.append(daily_playlist_instance)
+        playlist = existing.get((channel['name'], channel['playlist'], channel['playback']))
+        if playlist is None:
+            playlist = create_daily_playlist(channel)
+            created.append(playlist)
+        updated.append(playlist)
 
-def initialize_app():
-    """Initialize the application - called when the module is imported"""
+    previous = list(channel_playlists)
+    channel_playlists[:] = updated  # Swapped in one step
+    warm_playlists(created, wait=False)
+
+    # Wake listeners of channel numbers that now point at a different channel
+    for channel_number, notifier in list(track_notifiers.items()):
+        before = previous[channel_number] if channel_number < len(previous) else None
+        after = updated[channel_number] if channel_number < len(updated) else None
+        if before is not after:
+            notifier.notify()
+
+    removed = len(set(map(id, previous)) - set(map(id, updated)))
+    print(f"Channels updated: {len(created)} rebuilt, {removed} removed, {len(updated) - len(created)} unchanged")
+
+    if current_config.get_plex_config() != plex_config:
+        print("Warning: Plex server settings changed; restart the server to apply them")
+
+def initialize_app(preload=False):
+    """
+    Build every channel's schedule, then prepare for the fork if preloading or
+    start the background threads, unless the gunicorn hooks do that
+    """
     print("Starting Plex Radio API...")
     print("Available endpoints:")
     print("  GET /current-song - Get current song from default playlist")
     print("  GET /current-song/<channel_number> - Get current song from specific channel")
+    print("  GET /now-playing - Get current song from every channel at once")
+    print("  GET /schedule/<channel_number> - Program guide for a channel (JSON lines)")
+    print("  GET /events/<channel_number> - Server-Sent Events stream of track changes")
     print("  GET /channels - List all available channels")
     print("  GET /health - Health check")
+    print("  GET /metrics - Prometheus metrics")
+    if request_profiler is not None:
+        print("  GET/POST /debug/profile - Capture a profile on this worker")
 
     print("Generating daily playlists...")
-    generate_daily_playlists()
+    # Warm-up threads would not survive the fork, so a preloading master always waits for them
+    generate_daily_playlists(wait=preload or not LAZY_WARMUP)
+    if preload:
+        prepare_fork()
+    elif not GUNICORN_HOOKS:
+        start_background_tasks()
     print("Plex Radio API initialized successfully!")
 
-# Initialize when the module is imported (for Gunicorn)
-initialize_app()
+def prepare_fork():
+    """Get a preloading master ready to fork workers, which start their own background threads"""
+    # Warm-up threads would not survive the fork, so wait for them even with lazy_warmup
+    if startup_warmup is not None:
+        startup_warmup.shutdown(wait=True)
+    if shared_store is not None:
+        shared_store.release()  # One of the workers takes over as the writer
+    # Move the schedules out of the collector's reach so workers' GC passes
+    # don't write to (and so copy) the pages they share with the master
+    gc.freeze()
+
+def start_background_tasks():
+    """Start the refresher, Plex monitor and config watcher threads in this process"""
+    refresher.start()
+    plex_monitor.start()
+    if WATCH_CONFIG:
+        current_config.watch(apply_config_changes)
 
-def calculate_current_song_info(channel_number=0):
+def create_app(preload=False):
     """
-    Calculate the current song that should be playing based on time of day
-    and return its information including title, start time, and media link
+    Return the Flask app, initializing it on the first call. Importing this
+    module does not contact Plex; the connection and channel warm-up happen
+    here. With preload, schedules are built once in a master process and
+    shared copy-on-write by the forked workers, each of which must call
+    start_background_tasks() after the fork. Under gunicorn.conf.py its hooks
+    do this, following gunicorn's own preload_app setting.
     """
-    
-    # Added extra process to refresh the playlist if needed, this can cause initial slow load though
-    channel_playlists[channel_number].refresh_if_needed()
-    
-    try:
-        # Find the specified playlist
-        target_playlist = channel_playlists[channel_number] if channel_number < len(channel_playlists) else None
-        
-        if not target_playlist:
-            return None, f"Channel '{channel_number}' not found"
+    global app_started
+    with app_lock:
+        if not app_started:
+            initialize_app(preload)
+            app_started = True
+    return app
 
-        # Calculate playlist duration in seconds
-        playlist_duration_in_seconds = sum(item.duration for item in target_playlist.playlist_items) / 1000
+def locate_current_track(channel_number=0, now=None):
+    """
+    Find the track that should be playing on a channel at the given time.
+    Returns ((schedule, index, offset_ms, started_at), None) or (None, error).
+    """
+    # Find the specified playlist
+    target_playlist = channel_playlists[channel_number] if channel_number < len(channel_playlists) else None
+    
+    if not target_playlist:
+        return None, f"Channel '{channel_number}' not found"
 
-        # Calculate current time in seconds since midnight
-        now = datetime.datetime.now()
-        seconds_since_midnight = now.hour * 3600 + now.minute * 60 + now.second
-        
-        # Calculate where we should be in the playlist
-        playlist_start_time = seconds_since_midnight % playlist_duration_in_seconds
-        
-        # Find the current item and calculate start time within that item
-        cumulative_time = 0
-        for index, item in enumerate(target_playlist.playlist_items):
-            item_duration = item.duration / 1000
-            
-            if playlist_start_time < cumulative_time + item_duration:
-                # This is the current item
-                start_time_in_item = playlist_start_time - cumulative_time
-                
-                song_info = {
-                    "title": unidecode(item.title),
-                    "start_time": round(start_time_in_item),
-                    "media_link": f"{BASEURL}{item.media[0].parts[0].key}",
-                    "duration": item_duration,
-                    "artist": unidecode(getattr(item, 'grandparentTitle', 'Unknown')) if hasattr(item, 'grandparentTitle') else 'Unknown',
-                    "album": unidecode(getattr(item, 'parentTitle', 'Unknown')) if hasattr(item, 'parentTitle') else 'Unknown'
-                }
-
-                next_song_index = index + 1 if index+1 < len(target_playlist.playlist_items) else 0
-                
-                next_item = target_playlist.playlist_items[next_song_index]
-
-                next_song_info = {
-                    "title": unidecode(next_item.title),
-                    "start_time": 0,
-                    "media_link": f"{BASEURL}{next_item.media[0].parts[0].key}",
-                    "duration": next_item.duration/1000,
-                    "artist": unidecode(getattr(next_item, 'grandparentTitle', 'Unknown')) if hasattr(next_item, 'grandparentTitle') else 'Unknown',
-                    "album": unidecode(getattr(next_item, 'parentTitle', 'Unknown')) if hasattr(next_item, 'parentTitle') else 'Unknown'
-                }
-
-                song_info["next_song"] = next_song_info
-
-                return song_info, None
-            
-            cumulative_time += item_duration
-        
+    # Read the ready chunk once; the background refresher swaps in new ones
+    now = now or datetime.datetime.now()
+    schedule = target_playlist.get_schedule(now)
+    if not schedule or schedule.total_duration <= 0:
         return None, "No matching item found in playlist"
+
+    with metrics.TRACK_LOOKUP_DURATION.time():
+        index, offset, started_at = schedule.position_at(now)
+    return (schedule, index, offset, started_at), None
+
+def build_song_info(position):
+    """Build the current and next song payload for a located track"""
+    schedule, index, start_time_in_item, started_at = position
+    # The last track of a chunk is followed by the first track of the next one
+    next_payload = schedule.payloads[index + 1] if index + 1 < len(schedule) else schedule.next_payload
+
+    # Payloads are pre-rendered; only the start time varies per request
+    song_info = dict(
+        schedule.payloads[index],
+        start_time=round(start_time_in_item / 1000),
+        started_at=started_at.isoformat()
+    )
+    song_info["next_song"] = dict(next_payload, start_time=0)
+    return song_info
+
+def calculate_current_song_info(channel_number=0, now=None):
+    """
+    Calculate the current song that should be playing on a channel's timeline
+    and return its information including title, start time, and media link
+    """
+    try:
+        position, error = locate_current_track(channel_number, now)
+        if error:
+            return None, error
+        return build_song_info(position), None
         
     except Exception as e:
         return None, f"Error: {str(e)}"
 
-@app.route('/current-song', methods=['GET'])
-def get_current_song():
+def seconds_until_track_change(channel_number, now=None):
+    """Return seconds until the track on a channel changes, or None if unknown"""
+    now = now or datetime.datetime.now()
+    position, error = locate_current_track(channel_number, now)
+    if error:
+        return None
+    schedule, index, offset, started_at = position
+    return max(0, schedule.duration(index) - offset) / 1000
+
+def get_track_notifier(channel_number):
+    """Return the shared track change notifier for a channel"""
+    notifier = track_notifiers.get(channel_number)
+    if notifier is None:
+        notifier = track_notifiers.setdefault(
+            channel_number,
+            track_notifier.TrackChangeNotifier(lambda: seconds_until_track_change(channel_number))
+        )
+    return notifier
+
+def track_etag(channel_number, position):
+    """Identify one airing of a track on a channel"""
+    schedule, index, offset, started_at = position
+    return f"{channel_number}-{schedule.sequence(index)}-{int(started_at.timestamp())}"
+
+def wait_for_track_change(channel_number, wait):
     """
-    GET /current-song
-    Returns the current song information based on time of day
+    Hold a long-poll request until the channel's track changes. Returns
+    immediately if the client's If-None-Match is already out of date.
     """
-    song_info, error = calculate_current_song_info()
-    
+    notifier = get_track_notifier(channel_number)
+    version = notifier.version
+    if client_has_current_track(channel_number, request.if_none_match):
+        notifier.wait_for_change(version, timeout=clamp_long_poll_wait(wait))
+
+def clamp_long_poll_wait(wait):
+    return min(max(wait, 0), MAX_LONG_POLL_WAIT)
+
+def client_has_current_track(channel_number, if_none_match):
+    """Check if a long-poll client should be held: it sent no ETag or already has the current track"""
+    if not if_none_match:
+        return True
+    position, error = locate_current_track(channel_number)
+    return not error and if_none_match.contains_weak(track_etag(channel_number, position))
+
+def song_response(channel_number, **extra):
+    """
+    Build the /current-song response for a channel. The answer only changes at
+    the next track boundary, so it is cacheable until then and carries a weak
+    ETag identifying this airing of the track; matching conditional requests get 304.
+    With ?wait=<seconds> the request is held until the track changes.
+    """
+    wait = request.args.get('wait', type=float)
+    if wait:
+        if not held_connections.acquire(blocking=False):
+            return busy_response()
+        try:
+            wait_for_track_change(channel_number, wait)
+        finally:
+            held_connections.release()
+
+    now = datetime.datetime.now()
+    try:
+        position, error = locate_current_track(channel_number, now)
+        song_info = build_song_info(position) if position else None
+    except Exception as e:
+        position, song_info, error = None, None, f"Error: {str(e)}"
+
     if error:
         return jsonify({"error": error}), 404
-    print(song_info)
-    return jsonify({
-        "status": "success",
-        "data": song_info,
+    if DEBUG_LOGGING:
+        print(song_info)
+
+    with metrics.server_timing('serialize'):
+        response = jsonify({
+            "status": "success",
+            "data": song_info,
+            "timestamp": now.isoformat(),
+            **extra
+        })
+
+    schedule, index, offset, started_at = position
+    remaining = max(0, schedule.duration(index) - offset) // 1000
+    response.set_etag(track_etag(channel_number, position), weak=True)
+    response.cache_control.public = True
+    response.cache_control.max_age = remaining
+    # Naive datetimes are sent as UTC, so local now would be off by the UTC offset
+    response.expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=remaining)
+    response = response.make_conditional(request)
+    if request.if_none_match:
+        metrics.CACHE_REQUESTS.inc('http_etag', 'hit' if response.status_code == 304 else 'miss')
+    return response
+
+def track_event(channel_number, last_etag=None):
+    """
+    Render the SSE event for a channel's current track. Returns (event, etag);
+    event is None when the track is the one identified by last_etag.
+    """
+    position, error = locate_current_track(channel_number)
+    if error:
+        return f"event: error\ndata: {json.dumps({'error': error})}\n\n", last_etag
+    etag = track_etag(channel_number, position)
+    if etag == last_etag:
+        return None, etag
+    return f"id: {etag}\nevent: track\ndata: {json.dumps(build_song_info(position))}\n\n", etag
+
+def track_event_stream(channel_number):
+    """Yield an SSE event for the current track and another at every track change"""
+    notifier = get_track_notifier(channel_number)
+    last_etag = None
+    while True:
+        version = notifier.version
+        event, last_etag = track_event(channel_number, last_etag)
+        if event:
+            yield event
+
+        # Keep the connection alive until the channel's timer signals a change
+        while notifier.wait_for_change(version, timeout=SSE_KEEPALIVE_INTERVAL) == version:
+            yield ": keep-alive\n\n"
+
+def warming_response(channel_number=0):
+    """Return a 503 response if the channel's schedule is still being built"""
+    if channel_number < len(channel_playlists) and not channel_playlists[channel_number].is_ready():
+        response = jsonify({
+            "status": "warming",
+            "error": f"Channel '{channel_number}' is still warming up",
+            "timestamp": datetime.datetime.now().isoformat()
+        })
+        response.headers['Retry-After'] = '5'
+        response.cache_control.no_store = True
+        return response, 503
+    return None
+
+def busy_response():
+    """Return a 503 response when every thread allowed to hold a connection is taken"""
+    response = jsonify({
+        "status": "busy",
+        "error": "Too many open long-poll and event connections",
         "timestamp": datetime.datetime.now().isoformat()
     })
+    response.headers['Retry-After'] = '30'
+    response.cache_control.no_store = True
+    return response, 503
+
+@app.route('/current-song', methods=['GET'])
+def get_current_song():
+    """
+    GET /current-song
+    Returns the current song information based on time of day
+    """
+    warming = warming_response()
+    if warming:
+        return warming
+
+    return song_response(0)
 
 @app.route('/current-song/<channel_number>', methods=['GET'])
 def get_current_song_from_channel(channel_number):
@@ -143,26 +455,186 @@ def get_current_song_from_channel(channel_number):
     Returns the current song information from a specific channel
     """
 
-    channels = current_config.get_channels()
-    if not channels or int(channel_number) < 0 or int(channel_number) >= len(channels):
+    if not channel_number.isdigit() or int(channel_number) >= len(channel_playlists):
         return jsonify({"error": "Invalid channel number"}), 404
 
-    channel = channels[int(channel_number)]
-    song_info, error = calculate_current_song_info(int(channel_number))
+    channel = channel_playlists[int(channel_number)]
+    warming = warming_response(int(channel_number))
+    if warming:
+        return warming
 
-    if error:
-        return jsonify({"error": error}), 404
-    
-    return jsonify({
-        "status": "success",
-        "data": song_info,
-        "timestamp": datetime.datetime.now().isoformat(),
-        "channel": {
-            "name": channel['name'],
-            "playlist": channel['playlist'],
-            "playback": channel.get('playback', 'shuffle')
+    return song_response(
+        int(channel_number),
+        channel={
+            "name": channel.channel_name,
+            "playlist": channel.channel_playlist_name,
+            "playback": channel.playback_mode
         }
-    })
+    )
+
+@app.route('/now-playing', methods=['GET'])
+def now_playing():
+    """
+    GET /now-playing?channels=0,2
+    Returns current and next song for all channels (or the requested subset),
+    all computed from the same moment so channels are consistent with each other
+    """
+    requested = request.args.get('channels')
+    if requested:
+        try:
+            channel_numbers = [int(number) for number in requested.split(',') if number.strip()]
+        except ValueError:
+            return jsonify({"error": "channels must be a comma-separated list of channel numbers"}), 400
+        if any(number < 0 or number >= len(channel_playlists) for number in channel_numbers):
+            return jsonify({"error": "Invalid channel number"}), 404
+    else:
+        channel_numbers = range(len(channel_playlists))
+
+    now = datetime.datetime.now()
+    results = []
+    max_age = None
+    for channel_number in channel_numbers:
+        playlist = channel_playlists[channel_number]
+        entry = {
+            "channel": {
+                "number": channel_number,
+                "name": playlist.channel_name,
+                "playlist": playlist.channel_playlist_name,
+                "playback": playlist.playback_mode
+            }
+        }
+        try:
+            position, error = locate_current_track(channel_number, now) if playlist.is_ready() else (None, None)
+            song_info = build_song_info(position) if position else None
+        except Exception as e:
+            # One broken channel must not take the other channels' entries down with it
+            position, song_info, error = None, None, f"Error: {str(e)}"
+        if position:
+            schedule, index, offset, started_at = position
+            remaining = max(0, schedule.duration(index) - offset) // 1000
+            max_age = remaining if max_age is None else min(max_age, remaining)
+            entry["status"] = "success"
+            entry["data"] = song_info
+        elif error:
+            entry["status"] = "error"
+            entry["error"] = error
+        else:
+            entry["status"] = "warming"
+        results.append(entry)
+
+    with metrics.server_timing('serialize'):
+        response = jsonify({
+            "status": "success",
+            "data": results,
+            "count": len(results),
+            "timestamp": now.isoformat()
+        })
+    # Valid until the first of the listed channels changes track
+    if max_age is not None and all(entry["status"] == "success" for entry in results):
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_store = True
+    return response
+
+def parse_time_arg(name):
+    """
+    Parse a query argument given as a Unix timestamp or ISO 8601 time, as a
+    naive local time like the timeline's. Raises ValueError if it is invalid
+    or out of range.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        try:
+            return datetime.datetime.fromtimestamp(float(value))
+        except ValueError:
+            parsed = datetime.datetime.fromisoformat(value)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone().replace(tzinfo=None)
+        parsed.timestamp()  # The timeline converts it to epoch time, which fails near year 1 and 9999
+        return parsed
+    except (OverflowError, OSError) as e:
+        raise ValueError(str(e)) from e
+
+def iter_schedule_lines(channel_numbers, start, end, count):
+    """Yield one JSON line per track airing for each channel in turn"""
+    for channel_number in channel_numbers:
+        airings = channel_playlists[channel_number].iter_airings(start)
+        for sent, (schedule, index, started_at, ended_at) in enumerate(airings):
+            if sent >= count or (end is not None and started_at >= end):
+                break
+            entry = dict(
+                schedule.payloads[index],
+                channel=channel_number,
+                index=schedule.sequence(index),
+                start=started_at.isoformat(),
+                end=ended_at.isoformat(),
+                start_timestamp=started_at.timestamp(),
+                end_timestamp=ended_at.timestamp()
+            )
+            yield json.dumps(entry) + '\n'
+
+def schedule_response(channel_numbers):
+    """Stream the program guide for the given channels as JSON lines"""
+    try:
+        start = parse_time_arg('from') or datetime.datetime.now()
+        end = parse_time_arg('to')
+    except ValueError:
+        return jsonify({"error": "from/to must be a Unix timestamp or ISO 8601 time"}), 400
+
+    count = request.args.get('count', type=int)
+    if count is None:
+        count = MAX_SCHEDULE_COUNT if end is not None else DEFAULT_SCHEDULE_COUNT
+    count = min(max(count, 0), MAX_SCHEDULE_COUNT)
+
+    response = Response(
+        iter_schedule_lines(channel_numbers, start, end, count),
+        mimetype='application/x-ndjson'
+    )
+    # Lets clients estimate their clock offset and schedule track changes locally
+    response.headers['X-Server-Time'] = f"{time.time():.3f}"
+    return response
+
+@app.route('/schedule', methods=['GET'])
+def get_full_schedule():
+    """
+    GET /schedule?from=<ts>&to=<ts>&count=<n>
+    Streams the program guide for every channel as JSON lines
+    """
+    return schedule_response(range(len(channel_playlists)))
+
+@app.route('/schedule/<channel_number>', methods=['GET'])
+def get_channel_schedule(channel_number):
+    """
+    GET /schedule/<channel_number>?from=<ts>&to=<ts>&count=<n>
+    Streams the channel's track airings with absolute start and end times as JSON lines
+    """
+    if not channel_number.isdigit() or int(channel_number) >= len(channel_playlists):
+        return jsonify({"error": "Invalid channel number"}), 404
+
+    return schedule_response([int(channel_number)])
+
+@app.route('/events/<channel_number>', methods=['GET'])
+def channel_events(channel_number):
+    """
+    GET /events/<channel_number>
+    Server-Sent Events stream that pushes the current song at every track change
+    """
+    if not channel_number.isdigit() or int(channel_number) >= len(channel_playlists):
+        return jsonify({"error": "Invalid channel number"}), 404
+
+    if not held_connections.acquire(blocking=False):
+        return busy_response()
+    response = Response(
+        track_event_stream(int(channel_number)),
+        mimetype='text/event-stream',
+        headers=SSE_HEADERS
+    )
+    # The server closes the response when the stream ends or the client disconnects
+    response.call_on_close(held_connections.release)
+    return response
 
 @app.route('/channels', methods=['GET'])
 def get_channels():
@@ -182,26 +654,130 @@ def get_channels():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def channel_freshness(now=None):
+    """Summarize which channels are serving, and which could not check their playlist with Plex"""
+    now = now or datetime.datetime.now()
+    ready = []
+    stale = []
+    warming = []
+    for playlist in list(channel_playlists):
+        schedule = playlist.get_schedule(now)
+        if schedule is None:
+            warming.append(playlist.channel_name)
+            continue
+        ready.append(playlist.channel_name)
+        if playlist.sync_failed:
+            stale.append(playlist.channel_name)
+    return {
+        "total": len(ready) + len(warming),
+        "ready": len(ready),
+        "warming": warming,
+        "stale": stale
+    }
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """
     GET /health
-    Simple health check endpoint
+    Liveness plus cached Plex reachability and schedule freshness; never contacts Plex
+    """
+    channels = channel_freshness()
+    plex_status = plex_monitor.status()
+
+    # Channels keep playing their last good schedule while Plex is down, so
+    # only report unhealthy when nothing can be served at all
+    if channels["ready"] == 0 and channels["total"] > 0 and plex_status["reachable"] is False:
+        status = "unhealthy"
+    elif plex_status["reachable"] is False or channels["stale"] or channels["warming"]:
+        status = "degraded"
+    else:
+        status = "healthy"
+
+    return jsonify({
+        "status": status,
+        "plex_server": BASEURL,
+        "plex": plex_status,
+        "channels": channels,
+        "timestamp": datetime.datetime.now().isoformat()
+    }), 503 if status == "unhealthy" else 200
+
+@app.route('/debug/profile', methods=['GET', 'POST'])
+def debug_profile():
+    """
+    GET /debug/profile - status of this worker's profile capture
+    POST /debug/profile?mode=cprofile|sample&requests=N&seconds=T - start one
+    Only available when profiling is enabled.
     """
+    if request_profiler is None:
+        return jsonify({"error": "Endpoint not found"}), 404
+    if request.method == 'GET':
+        return jsonify(request_profiler.status())
+    if request_profiler.status()["running"]:
+        return jsonify({"error": "A profile capture is already running on this worker"}), 409
     try:
-        # Test Plex connection
-        plex.library
-        return jsonify({
-            "status": "healthy",
-            "plex_server": BASEURL,
-            "timestamp": datetime.datetime.now().isoformat()
-        })
-    except Exception as e:
-        return jsonify({
-            "status": "unhealthy",
-            "error": str(e),
-            "timestamp": datetime.datetime.now().isoformat()
-        }), 500
+        capture = request_profiler.start(
+            request.args.get('mode', 'cprofile'),
+            requests=request.args.get('requests', type=int),
+            seconds=request.args.get('seconds', type=float)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"status": "started", "capture": capture}), 202
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    GET /metrics
+    Prometheus metrics for this worker process
+    """
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+def channel_gauge(value):
+    """Build a gauge callback reporting value(playlist) for every channel"""
+    return lambda: [((playlist.channel_name,), value(playlist)) for playlist in list(channel_playlists)]
+
+metrics.REGISTRY.register(metrics.CallbackGauge(
+    'plex_radio_schedule_tracks', 'Tracks in the generated timeline', ('channel',),
+    channel_gauge(lambda playlist: sum(len(segment) for segment in playlist.segments))))
+metrics.REGISTRY.register(metrics.CallbackGauge(
+    'plex_radio_schedule_age_hours', 'Hours since the channel playlist was last checked with Plex', ('channel',),
+    channel_gauge(lambda playlist: round(playlist.get_age_hours(), 4))))
+metrics.REGISTRY.register(metrics.CallbackGauge(
+    'plex_radio_plex_up', 'Whether the last background probe reached Plex', (),
+    lambda: [((), int(bool(plex_monitor.reachable)))]))
+metrics.REGISTRY.register(metrics.CallbackGauge(
+    'plex_radio_channel_ready', 'Whether the channel has a schedule to serve', ('channel',),
+    channel_gauge(lambda playlist: int(playlist.is_ready()))))
+metrics.REGISTRY.register(metrics.CallbackGauge(
+    'plex_radio_schedule_writer', 'Whether this worker generates the shared schedules', (),
+    lambda: [((), int(shared_store is None or shared_store.is_writer()))]))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if SERVER_TIMING:
+        metrics.start_server_timings()
+    if request_profiler is not None:
+        g.profile = request_profiler.begin_request()
+
+@app.after_request
+def record_request_duration(response):
+    start = g.get('request_start')
+    if start is not None:
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.REQUEST_DURATION.observe(elapsed, route, str(response.status_code))
+        if SERVER_TIMING:
+            # Streamed bodies (/schedule, /events) are generated after these headers are sent
+            timings = metrics.finish_server_timings()
+            total = f"total;dur={elapsed * 1000:.3f}"
+            response.headers['Server-Timing'] = f"{timings}, {total}" if timings else total
+    return response
+
+@app.teardown_request
+def finish_request_profile(error=None):
+    if request_profiler is not None:
+        request_profiler.end_request(g.pop('profile', None))
 
 @app.errorhandler(404)
 def not_found(error):
@@ -212,4 +788,4 @@ def internal_error(error):
     return jsonify({"error": "Internal server error"}), 500
 
 if __name__ == '__main__':    
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app(preload=False).run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,161 @@
+"""
+Opt-in profiling for live workers. A capture either runs cProfile on the
+next N requests (or on every request for T seconds), or samples the stacks
+of every thread for T seconds, and writes the result to disk:
+
+- cprofile: a pstats file, e.g. `python -m pstats profile-<pid>-<time>.prof`
+  or snakeviz. Only one request is profiled at a time; requests that arrive
+  while another is being profiled run unprofiled.
+- sample: folded stacks (one "frame;frame;frame count" line per stack) for
+  flamegraph.pl or speedscope. This also sees the background refresher and
+  Plex calls, not only request threads.
+"""
+import cProfile
+import collections
+import os
+import pstats
+import sys
+import threading
+import time
+
+MODES = ('cprofile', 'sample')
+SAMPLE_INTERVAL = 0.005  # Seconds between stack samples
+MAX_REQUESTS = 100000
+MAX_SECONDS = 3600
+
+class RequestProfiler:
+    """Runs one profile capture at a time and writes it to output_dir when it ends"""
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.last_output = None  # Path written by the last finished capture
+        self._lock = threading.Lock()
+        self._profiling = threading.Lock()  # Held while a request runs under cProfile
+        self._capture = None  # Settings and progress of the running capture, if any
+        self._stats = None
+
+    def start(self, mode='cprofile', requests=None, seconds=None):
+        """Start a capture and return its description; raises ValueError for bad settings or a running capture"""
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of: {', '.join(MODES)}")
+        if mode == 'sample' and not seconds:
+            raise ValueError("sample captures need seconds")
+        if not requests and not seconds:
+            requests = 100
+        requests = min(int(requests), MAX_REQUESTS) if requests else None
+        seconds = min(float(seconds), MAX_SECONDS) if seconds else None
+        with self._lock:
+            if self._capture is not None:
+                raise ValueError("a profile capture is already running")
+            started = time.time()
+            capture = {
+                "mode": mode,
+                "requests": requests,
+                "seconds": seconds,
+                "profiled_requests": 0,
+                "samples": 0,
+                "started": started,
+                "pid": os.getpid(),
+                "output": os.path.join(
+                    self.output_dir,
+                    f"profile-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(started))}"
+                    f".{'prof' if mode == 'cprofile' else 'folded'}"
+                )
+            }
+            self._capture = capture
+            self._stats = None
+        if mode == 'sample':
+            threading.Thread(target=self.sample, args=(capture,), name='profile-sampler', daemon=True).start()
+        elif seconds:
+            timer = threading.Timer(seconds, self.finish, args=(capture,))
+            timer.daemon = True
+            timer.start()
+        print(f"Profiling started: {self.describe(capture)}")
+        return self.describe(capture)
+
+    def status(self):
+        with self._lock:
+            capture = self._capture
+        return {"running": self.describe(capture) if capture else None, "last_output": self.last_output}
+
+    @staticmethod
+    def describe(capture):
+        keys = ('mode', 'requests', 'seconds', 'profiled_requests', 'samples', 'pid', 'output')
+        return {key: capture[key] for key in keys}
+
+    def begin_request(self):
+        """Start profiling the current request if a cProfile capture wants it; return a token for end_request"""
+        capture = self._capture
+        if capture is None or capture['mode'] != 'cprofile' or not self._profiling.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        profile.enable()
+        return capture, profile
+
+    def end_request(self, token):
+        """Stop profiling a request started with begin_request and add it to its capture"""
+        if token is None:
+            return
+        capture, profile = token
+        profile.disable()
+        self._profiling.release()
+        with self._lock:
+            if self._capture is not capture:
+                return  # The capture ended while this request ran
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            capture['profiled_requests'] += 1
+            done = capture['requests'] and capture['profiled_requests'] >= capture['requests']
+        if done:
+            self.finish(capture)
+
+    def sample(self, capture):
+        """Sample every other thread's stack until the capture's time is up"""
+        stacks = collections.Counter()
+        own_thread = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + capture['seconds']
+        while time.monotonic() < deadline:
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                stacks[';'.join(reversed(frames))] += 1
+            capture['samples'] += 1
+            time.sleep(SAMPLE_INTERVAL)
+        with self._lock:
+            self._stats = stacks
+        self.finish(capture)
+
+    def finish(self, capture):
+        """End a capture and write its results; does nothing if it already ended"""
+        with self._lock:
+            if self._capture is not capture:
+                return
+            self._capture = None
+            stats, self._stats = self._stats, None
+        path = capture['output']
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            if capture['mode'] == 'sample':
+                with open(path, 'w', encoding='utf-8') as file:
+                    for stack, count in (stats or {}).items():
+                        file.write(f"{stack} {count}\n")
+            elif stats is not None:
+                stats.dump_stats(path)
+            else:
+                print("Profiling finished without any profiled requests")
+                return
+        except OSError as e:
+            print(f"Could not write profile {path}: {e}")
+            return
+        self.last_output = path
+        print(f"Profile written to {path}")
@@ -8,8 +8,10 @@ import sys
 # Add the server directory to Python path
 sys.path.insert(0, os.path.dirname(__file__))
 
-# Import the Flask app
-from plex_radio_api import app
+# Build the Flask app (schedules are built here, in the master when gunicorn preloads;
+# gunicorn.conf.py starts the background threads in each worker)
+import plex_radio_api
+app = plex_radio_api.create_app()
 
 # Optional: Additional production setup
 if __name__ != "__main__":
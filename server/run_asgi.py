@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point for Plex Radio API
+
+Serves the same routes as run.py. SSE streams (/events/<n>) and long-polls
+(/current-song?wait=) are held on the event loop without a thread each, so a
+single process can keep thousands of listeners connected. Every other request
+runs the Flask app on a bounded thread pool, keeping Plex I/O off the loop.
+
+    uvicorn server.run_asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import io
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode
+
+# Add the server directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from werkzeug.http import parse_etags
+import plex_radio_api
+
+WSGI_THREADS = 32  # Threads available to regular (short) Flask requests
+
+EVENTS_PATH = re.compile(r'/events/(\d+)')
+CURRENT_SONG_PATH = re.compile(r'/current-song(?:/(\d+))?')
+
+def build_environ(scope, body):
+    """Build a WSGI environ for an ASGI HTTP scope"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1')
+        value = value.decode('latin-1')
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'content-length':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+class ThreadedWsgiBridge:
+    """Run a WSGI app on a thread pool and stream its response back over ASGI"""
+    def __init__(self, wsgi_app, workers=WSGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            body.extend(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+
+        loop = asyncio.get_running_loop()
+        environ = build_environ(scope, bytes(body))
+        await loop.run_in_executor(self.executor, self.run_wsgi, environ, send, loop)
+
+    def run_wsgi(self, environ, send, loop):
+        start_message = {}
+
+        def send_sync(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def start_response(status, headers, exc_info=None):
+            start_message.update({
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+            })
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            started = False
+            for chunk in result:
+                if not started:
+                    send_sync(start_message)
+                    started = True
+                if chunk:
+                    send_sync({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not started:
+                send_sync(start_message)
+            send_sync({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        except OSError:
+            pass  # Client disconnected mid-stream
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+flask_app = ThreadedWsgiBridge(plex_radio_api.create_app(preload=False))
+
+def get_header(scope, name):
+    for header, value in scope.get('headers', []):
+        if header == name:
+            return value.decode('latin-1')
+    return None
+
+def is_ready_channel(channel_number):
+    playlists = plex_radio_api.channel_playlists
+    return channel_number < len(playlists) and playlists[channel_number].is_ready()
+
+async def run_blocking(function, *args):
+    """
+    Run a schedule lookup on the bridge's pool: a lookup can generate a chunk,
+    wait for the refresher's lock or map a newly published timeline, none of
+    which may stall the other listeners on the event loop
+    """
+    return await asyncio.get_running_loop().run_in_executor(flask_app.executor, function, *args)
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+async def stream_events(channel_number, receive, send):
+    """Async SSE stream: one coroutine per listener, woken by the channel's shared notifier"""
+    headers = [(b'content-type', b'text/event-stream; charset=utf-8')]
+    headers += [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in plex_radio_api.SSE_HEADERS.items()]
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+
+    notifier = plex_radio_api.get_track_notifier(channel_number)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    last_etag = None
+    try:
+        while not disconnected.done():
+            version = notifier.version
+            event, last_etag = await run_blocking(plex_radio_api.track_event, channel_number, last_etag)
+            if event:
+                await send({'type': 'http.response.body', 'body': event.encode('utf-8'), 'more_body': True})
+
+            # Keep the connection alive until the channel's timer signals a change
+            while not disconnected.done():
+                changed = asyncio.ensure_future(
+                    notifier.wait_for_change_async(version, timeout=plex_radio_api.SSE_KEEPALIVE_INTERVAL)
+                )
+                await asyncio.wait([changed, disconnected], return_when=asyncio.FIRST_COMPLETED)
+                if not changed.done():
+                    changed.cancel()
+                    break
+                if changed.result() != version:
+                    break
+                await send({'type': 'http.response.body', 'body': b': keep-alive\n\n', 'more_body': True})
+    except OSError:
+        pass  # Client went away while we were sending
+    finally:
+        disconnected.cancel()
+
+async def hold_long_poll(channel_number, scope, wait):
+    """Hold a ?wait= request on the event loop until the channel's track changes"""
+    notifier = plex_radio_api.get_track_notifier(channel_number)
+    version = notifier.version
+    if_none_match = get_header(scope, b'if-none-match')
+    etags = parse_etags(if_none_match) if if_none_match else None
+    if await run_blocking(plex_radio_api.client_has_current_track, channel_number, etags):
+        await notifier.wait_for_change_async(version, timeout=plex_radio_api.clamp_long_poll_wait(wait))
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                flask_app.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] != 'http':
+        return
+
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        match = EVENTS_PATH.fullmatch(scope['path'])
+        if match and int(match.group(1)) < len(plex_radio_api.channel_playlists):
+            await stream_events(int(match.group(1)), receive, send)
+            return
+
+        match = CURRENT_SONG_PATH.fullmatch(scope['path'])
+        query = parse_qsl(scope['query_string'].decode('latin-1'))
+        wait = dict(query).get('wait')
+        if match and wait:
+            channel_number = int(match.group(1) or 0)
+            try:
+                wait = float(wait)
+            except ValueError:
+                wait = 0
+            if wait > 0 and is_ready_channel(channel_number):
+                await hold_long_poll(channel_number, scope, wait)
+            # Let Flask answer immediately with the (possibly new) current track
+            query = [(name, value) for name, value in query if name != 'wait']
+            scope = dict(scope, query_string=urlencode(query).encode('latin-1'))
+
+    await flask_app(scope, receive, send)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=5000)
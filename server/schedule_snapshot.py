@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+from track_record import TrackRecord
+
+SNAPSHOT_VERSION = 3
+
+def readable_slug(channel_name):
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', channel_name).strip('_') or 'channel'
+
+def channel_slug(channel_name):
+    """File name stem for a channel; the hash keeps names that slug alike (e.g. non-ASCII ones) apart"""
+    digest = hashlib.sha256(channel_name.encode('utf-8')).hexdigest()[:8]
+    return f"{readable_slug(channel_name)}-{digest}"
+
+def snapshot_path(snapshot_dir, channel_name):
+    """Return the snapshot file path for a channel"""
+    return os.path.join(snapshot_dir, f"{channel_slug(channel_name)}.jsonl")
+
+def save_snapshot(snapshot_dir, channel_name, playlist_name, playback_mode, tracks, state, previous_tracks=()):
+    """
+    Write a channel's source playlist as JSON lines (header line, then one
+    array per track, then one per track of the previous version while it is
+    still airing) atomically. state holds the timeline anchors and sync
+    details and is stored in the header.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = snapshot_path(snapshot_dir, channel_name)
+    header = dict(
+        state,
+        version=SNAPSHOT_VERSION,
+        channel=channel_name,
+        playlist=playlist_name,
+        playback=playback_mode,
+        previous_tracks=len(previous_tracks)
+    )
+    # Unique temp file so several workers can write the same snapshot safely
+    fd, temp_path = tempfile.mkstemp(dir=snapshot_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as file:
+        file.write(json.dumps(header) + '\n')
+        for item in (*tracks, *previous_tracks):
+            file.write(json.dumps(item.to_list(), ensure_ascii=False) + '\n')
+    os.replace(temp_path, path)
+    return path
+
+def load_snapshot(snapshot_dir, channel_name, playlist_name, playback_mode):
+    """
+    Load a channel's snapshot. Returns (tracks, header, previous_tracks), or
+    None if there is no valid snapshot for this channel, playlist and
+    playback mode.
+    """
+    path = snapshot_path(snapshot_dir, channel_name)
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            header = json.loads(file.readline())
+            expected = (SNAPSHOT_VERSION, channel_name, playlist_name, playback_mode)
+            actual = tuple(header.get(key) for key in ('version', 'channel', 'playlist', 'playback'))
+            if actual != expected:
+                return None
+            tracks = [TrackRecord(*json.loads(line)) for line in file if line.strip()]
+        previous_count = int(header.get('previous_tracks', 0))
+        if not 0 <= previous_count < len(tracks):
+            previous_count = 0
+        split = len(tracks) - previous_count
+        tracks, previous_tracks = tracks[:split], tracks[split:]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, TypeError) as e:
+        print(f"Ignoring unreadable schedule snapshot {path}: {e}")
+        return None
+
+    if not tracks:
+        return None
+    return tracks, header, previous_tracks
+
+def remove_legacy_snapshots(snapshot_dir, channel_name):
+    """Remove this channel's snapshots written by earlier versions, which were named without a hash"""
+    prefix = f"{readable_slug(channel_name)}."
+    try:
+        names = os.listdir(snapshot_dir)
+    except OSError:
+        return
+    for name in names:
+        day = name[len(prefix):-len('.jsonl')]
+        if name.startswith(prefix) and name.endswith('.jsonl') and (day.isdigit() or not day):
+            try:
+                os.remove(os.path.join(snapshot_dir, name))
+            except OSError:
+                pass
@@ -0,0 +1,257 @@
+from array import array
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import weakref
+from daily_playlist import Schedule, from_timeline_ms, timeline_ms
+from schedule_snapshot import channel_slug
+
+try:
+    import fcntl
+except ImportError:  # No flock (Windows): every process then generates and publishes its own timeline
+    fcntl = None
+
+STORE_MAGIC = b'PRTL'
+STORE_VERSION = 2
+# magic, version, channel fingerprint, created ms, synced ms (-1 if never), sync failed,
+# then the number of segments, airings, tracks and string table bytes
+HEADER = struct.Struct('<4sI16sqqIIIII4x')
+SEGMENT_FIELDS = 6  # start_ms, end_ms, first_sequence, first airing, airing count, next track (-1 for none)
+STRING_FIELDS = ('title', 'media_link', 'artist', 'album')  # Stored per track, already ASCII-folded
+LOCK_NAME = 'timeline.lock'
+
+# Stores whose writer lock is dropped in a forked child (the lock belongs to the parent)
+_stores = weakref.WeakSet()
+
+def _reset_stores_after_fork():
+    for store in list(_stores):
+        store.forget_writer_lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_stores_after_fork)
+
+def channel_fingerprint(playlist):
+    """Identify a channel definition, so a timeline is never served for a channel it wasn't built for"""
+    key = f"{playlist.channel_name}|{playlist.channel_playlist_name}|{playlist.playback_mode}|{playlist.base_url}"
+    return hashlib.sha256(key.encode('utf-8')).digest()[:16]
+
+def encode_timeline(fingerprint, segments, synced_at, sync_failed):
+    """
+    Serialize generated chunks into the store's file format: a header, then
+    int64 tables (segments, airing offsets, track durations, string ends),
+    the int32 track index of each airing and a UTF-8 string table. Each
+    distinct track is stored once, however often it airs.
+    """
+    track_numbers = {}
+    durations = array('q')
+    string_ends = array('q')
+    strings = bytearray()
+
+    def track_number(item, payload):
+        number = track_numbers.get(id(item))
+        if number is None:
+            number = track_numbers[id(item)] = len(durations)
+            durations.append(item.duration)
+            for field in STRING_FIELDS:
+                strings.extend(payload[field].encode('utf-8'))
+                string_ends.append(len(strings))
+        return number
+
+    segment_table = array('q')
+    airing_offsets = array('q')
+    airing_tracks = array('i')
+    for segment in segments:
+        first_airing = len(airing_tracks)
+        for item, payload, offset in zip(segment.items, segment.payloads, segment.start_offsets):
+            airing_tracks.append(track_number(item, payload))
+            airing_offsets.append(offset)
+        next_track = track_number(segment.next_item, segment.next_payload) if segment.next_item else -1
+        segment_table.extend((segment.start_ms, segment.end_ms, segment.first_sequence, first_airing, len(segment),
+                              next_track))
+
+    header = HEADER.pack(
+        STORE_MAGIC, STORE_VERSION, fingerprint, timeline_ms(),
+        timeline_ms(synced_at) if synced_at else -1, int(sync_failed),
+        len(segments), len(airing_tracks), len(durations), len(strings)
+    )
+    return b''.join((header, segment_table.tobytes(), airing_offsets.tobytes(), durations.tobytes(),
+                     string_ends.tobytes(), airing_tracks.tobytes(), bytes(strings)))
+
+class PublishedTimeline:
+    """A channel timeline mapped read-only from the store. Its chunks read the mapped pages without copying them."""
+    def __init__(self, path, fingerprint):
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            self.version = (stat.st_ino, stat.st_mtime_ns)
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._buffer)
+
+        (magic, version, file_fingerprint, created_ms, synced_ms, sync_failed,
+         segment_count, airing_count, track_count, string_bytes) = HEADER.unpack_from(view)
+        if magic != STORE_MAGIC or version != STORE_VERSION:
+            raise ValueError(f"not a version {STORE_VERSION} timeline file")
+        self.matches = file_fingerprint == fingerprint
+        self.created = from_timeline_ms(created_ms)
+        self.synced_at = from_timeline_ms(synced_ms) if synced_ms >= 0 else None
+        self.sync_failed = bool(sync_failed)
+
+        position = HEADER.size
+        def take(typecode, count):
+            nonlocal position
+            size = count * array(typecode).itemsize
+            if position + size > len(view):
+                raise ValueError("truncated timeline file")
+            section = view[position:position + size].cast(typecode)
+            position += size
+            return section
+
+        segment_table = take('q', segment_count * SEGMENT_FIELDS)
+        self.airing_offsets = take('q', airing_count)
+        self.durations = take('q', track_count)
+        self.string_ends = take('q', track_count * len(STRING_FIELDS))
+        self.airing_tracks = take('i', airing_count)
+        self.strings = take('B', string_bytes)
+
+        self.segments = tuple(
+            SharedSchedule(self, *segment_table[index:index + SEGMENT_FIELDS])
+            for index in range(0, len(segment_table), SEGMENT_FIELDS)
+        )
+
+    def payload(self, track):
+        """Build the API payload for a track from the string table"""
+        first = track * len(STRING_FIELDS)
+        start = self.string_ends[first - 1] if first else 0
+        fields = {}
+        for offset, field in enumerate(STRING_FIELDS):
+            end = self.string_ends[first + offset]
+            fields[field] = str(self.strings[start:end], 'utf-8')
+            start = end
+        return {
+            "title": fields['title'],
+            "media_link": fields['media_link'],
+            "duration": self.durations[track] / 1000,
+            "artist": fields['artist'],
+            "album": fields['album']
+        }
+
+class PayloadView:
+    """A chunk's track payloads, decoded from the string table on access"""
+    def __init__(self, timeline, tracks):
+        self.timeline = timeline
+        self.tracks = tracks
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def __getitem__(self, index):
+        return self.timeline.payload(self.tracks[index])
+
+class SharedSchedule(Schedule):
+    """A chunk of a PublishedTimeline, served like a Schedule generated in this process"""
+    def __init__(self, timeline, start_ms, end_ms, first_sequence, first_airing, count, next_track):
+        self.timeline = timeline
+        self.start_ms = start_ms
+        self.end_ms = end_ms  # Stored, as the last airing may have been cut short
+        self.first_sequence = first_sequence
+        self.creation_time = timeline.created
+        self.tracks = timeline.airing_tracks[first_airing:first_airing + count]
+        self.start_offsets = timeline.airing_offsets[first_airing:first_airing + count]
+        self.payloads = PayloadView(timeline, self.tracks)
+        self.next_item = None  # Only the writer process holds the track records
+        self.next_payload = timeline.payload(next_track) if next_track >= 0 else None
+        self.total_duration = end_ms - start_ms
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def item_duration(self, index):
+        return self.timeline.durations[self.tracks[index]]
+
+class ScheduleStore:
+    """
+    Channel timelines shared by every worker on a host through files in the
+    data directory. Whichever process holds the writer lock syncs with Plex,
+    generates the timelines and publishes them; the others map the published
+    files read-only and pick up each new version when it is swapped in. If
+    the writer exits, the next process to find the lock free takes over.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.term = 0  # Incremented each time this process becomes the writer
+        self._lock_file = None
+        self._lock = threading.Lock()
+        _stores.add(self)
+
+    def path(self, channel_name):
+        """Return the published timeline file for a channel"""
+        return os.path.join(self.directory, f"{channel_slug(channel_name)}.timeline")
+
+    def is_writer(self):
+        return fcntl is None or self._lock_file is not None
+
+    def acquire_writer(self):
+        """Return True if this process is the writer, taking the writer lock if it is free"""
+        if self.is_writer():
+            return True
+        with self._lock:
+            if self._lock_file is not None:
+                return True
+            os.makedirs(self.directory, exist_ok=True)
+            lock_file = open(os.path.join(self.directory, LOCK_NAME), 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            self._lock_file = lock_file
+            self.term += 1
+        print(f"Process {os.getpid()} is now the schedule writer")
+        return True
+
+    def release(self):
+        """Give up the writer lock, e.g. in a preloading gunicorn master before it forks workers"""
+        with self._lock:
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    def forget_writer_lock(self):
+        """Drop the lock inherited over fork; closing our copy leaves the parent's lock alone"""
+        self._lock = threading.Lock()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def publish(self, playlist):
+        """Atomically replace the published timeline of a channel"""
+        data = encode_timeline(
+            channel_fingerprint(playlist), playlist.segments, playlist.source_synced_at, playlist.sync_failed
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, self.path(playlist.channel_name))
+
+    def load(self, playlist, current=None):
+        """
+        Map the published timeline of a channel. Returns None if nothing is
+        published for this channel definition yet, the file is unreadable, or
+        it is still the same version as current.
+        """
+        path = self.path(playlist.channel_name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if current is not None and current.version == (stat.st_ino, stat.st_mtime_ns):
+            return None
+        try:
+            published = PublishedTimeline(path, channel_fingerprint(playlist))
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Ignoring unreadable shared timeline {path}: {e}")
+            return None
+        return published if published.matches and published.segments else None
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+class TrackChangeNotifier:
+    """
+    Wakes every subscriber of a channel when its current track changes.
+    A single timer per channel sleeps until the next track boundary and then
+    notifies all waiters at once, so idle listeners cost no polling.
+    """
+    def __init__(self, seconds_until_change, retry_interval=5):
+        self.seconds_until_change = seconds_until_change  # Callable returning seconds to next boundary, or None
+        self.retry_interval = retry_interval  # Used when the boundary is unknown (e.g. channel warming)
+        self.version = 0  # Incremented at every track change
+        self._condition = threading.Condition()
+        self._timer = None
+        self._async_waiters = set()  # (event loop, future) pairs awaiting the next change
+
+    def ensure_started(self):
+        """Start the boundary timer if it is not already running"""
+        with self._condition:
+            if self._timer is None:
+                self._schedule_next()
+
+    def stop(self):
+        with self._condition:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _schedule_next(self):
+        try:
+            delay = self.seconds_until_change()
+        except Exception as e:
+            print(f"Error computing next track boundary: {e}")
+            delay = None
+        if delay is None:
+            delay = self.retry_interval
+        # Fire just after the boundary so the new track is already current
+        self._timer = threading.Timer(max(delay, 0) + 0.05, self._fire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _fire(self):
+        with self._condition:
+            # Ignore timers that were stopped or replaced while waiting for the lock
+            if threading.current_thread() is not self._timer:
+                return
+            self._wake_all()
+            self._schedule_next()
+
+    def notify(self):
+        """Wake all subscribers now and recompute the next boundary (e.g. after a channel change)"""
+        with self._condition:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._wake_all()
+            self._schedule_next()
+
+    def _wake_all(self):
+        """Bump the version and wake thread and asyncio waiters (called with the lock held)"""
+        self.version += 1
+        self._condition.notify_all()
+        for loop, future in self._async_waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+        self._async_waiters.clear()
+
+    def wait_for_change(self, version, timeout=None):
+        """Block until the version moves past the given one or timeout expires; return the current version"""
+        self.ensure_started()
+        with self._condition:
+            self._condition.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    async def wait_for_change_async(self, version, timeout=None):
+        """Asyncio variant of wait_for_change that holds no thread while waiting"""
+        self.ensure_started()
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._condition:
+            if self.version != version:
+                return self.version
+            self._async_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._condition:
+                self._async_waiters.discard(waiter)
+        return self.version
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
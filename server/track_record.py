@@ -0,0 +1,52 @@
+from unidecode import unidecode
+
+class TrackRecord:
+    """Compact track holding only the fields the API serves"""
+    __slots__ = ('title', 'duration', 'artist', 'album', 'media_key')
+
+    def __init__(self, title, duration, artist, album, media_key):
+        self.title = title
+        self.duration = duration  # Milliseconds
+        self.artist = artist
+        self.album = album
+        self.media_key = media_key  # Plex media part key, e.g. /library/parts/123/file.mp3
+
+    @classmethod
+    def from_plex(cls, item):
+        """Extract a TrackRecord from a plexapi Track, or None if it is not playable"""
+        try:
+            media_key = item.media[0].parts[0].key
+        except (AttributeError, IndexError):
+            return None
+        if not item.duration or not media_key:
+            return None
+        return cls(
+            item.title or 'Unknown',
+            item.duration,
+            getattr(item, 'grandparentTitle', None) or 'Unknown',
+            getattr(item, 'parentTitle', None) or 'Unknown',
+            media_key
+        )
+
+    def render(self, base_url):
+        """Build the ASCII-folded API payload for this track (without start_time)"""
+        return {
+            "title": unidecode(self.title),
+            "media_link": f"{base_url}{self.media_key}",
+            "duration": self.duration / 1000,
+            "artist": unidecode(self.artist),
+            "album": unidecode(self.album)
+        }
+
+    def to_list(self):
+        """Return the record's fields in constructor order"""
+        return [self.title, self.duration, self.artist, self.album, self.media_key]
+
+def records_from_plex(items):
+    """Convert plexapi Tracks to TrackRecords, dropping items that cannot be played"""
+    records = []
+    for item in items:
+        record = TrackRecord.from_plex(item)
+        if record is not None:
+            records.append(record)
+    return records
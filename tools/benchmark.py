@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for Plex Radio's hot paths, reported as JSON
+
+Runs fully offline: timeline generation uses synthetic TrackRecords, and the
+lookup and HTTP benchmarks load the real app against the bundled fake Plex
+server (tools/fake_plex_server.py) through a temporary config file.
+
+    python tools/benchmark.py --output results.json
+    python tools/benchmark.py --quick --baseline results.json
+
+With --baseline, timings that got slower than the threshold are listed and
+the script exits with status 1, so it can gate a CI job.
+"""
+import argparse
+import contextlib
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.join(os.path.dirname(TOOLS_DIR), 'server')
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, TOOLS_DIR)
+
+from daily_playlist import DailyPlaylist, LOOKAHEAD, TIMELINE_EPOCH_MS, timeline_ms
+from fake_plex_server import FakePlexServer
+from track_record import TrackRecord
+
+DEFAULT_SIZES = (1000, 10000, 50000, 100000, 200000)
+QUICK_SIZES = (1000, 10000)
+
+def synthetic_tracks(count, seed=0):
+    """Build count TrackRecords with realistic durations and metadata"""
+    rng = random.Random(seed)
+    return [
+        TrackRecord(f"Track {i}", rng.randint(90, 420) * 1000, f"Artist {i % 997}", f"Album {i % 4999}",
+                    f"/library/parts/{i}/file.mp3")
+        for i in range(count)
+    ]
+
+def summarize(samples):
+    """Latency summary in seconds for a list of timings"""
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "min": samples[0],
+        "median": statistics.median(samples),
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        "mean": statistics.fmean(samples),
+    }
+
+def time_calls(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def timeline_playlist(tracks, mode):
+    """Build an offline DailyPlaylist over synthetic tracks, without a generated timeline"""
+    playlist = DailyPlaylist(None, 'benchmark', mode, warm=False)
+    playlist.current_playlist = tracks
+    return playlist
+
+def bench_timeline(sizes, repeat):
+    """
+    Time building a channel timeline from scratch (positioning it at now and
+    generating LOOKAHEAD ahead) and generating one more chunk, for each source
+    playlist size and playback mode
+    """
+    results = []
+    for size in sizes:
+        tracks = synthetic_tracks(size)
+        for mode in ('shuffle', 'sequential'):
+            now_ms = timeline_ms()
+
+            def cold_start():
+                playlist = timeline_playlist(tracks, mode)
+                playlist.start_timeline(TIMELINE_EPOCH_MS, now_ms)
+                playlist.extend_timeline(now_ms + LOOKAHEAD, now_ms)
+                return playlist
+
+            playlist = cold_start()
+            results.append({
+                "tracks": size,
+                "playback": mode,
+                "timeline_tracks": sum(len(segment) for segment in playlist.segments),
+                "cold_start_seconds": summarize(time_calls(cold_start, repeat)),
+                "generate_chunk_seconds": summarize(time_calls(playlist.generate_chunk, repeat)),
+            })
+    return results
+
+def bench_schedule_memory(sizes):
+    """Bytes allocated for a source playlist and its generated timeline"""
+    results = []
+    for size in sizes:
+        gc.collect()
+        tracemalloc.start()
+        tracks = synthetic_tracks(size)
+        source_bytes = tracemalloc.get_traced_memory()[0]
+        now_ms = timeline_ms()
+        playlist = timeline_playlist(tracks, 'shuffle')
+        playlist.start_timeline(TIMELINE_EPOCH_MS, now_ms)
+        playlist.extend_timeline(now_ms + LOOKAHEAD, now_ms)
+        total_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results.append({
+            "tracks": size,
+            "source_bytes": source_bytes,
+            "source_bytes_per_track": round(source_bytes / size, 1),
+            "timeline_tracks": sum(len(segment) for segment in playlist.segments),
+            "timeline_bytes": total_bytes - source_bytes,
+        })
+    return results
+
+def write_config(path, plex_url, channels):
+    """Write a plex_radio_config.yaml pointing at the fake Plex server"""
+    lines = ['plex:', f'  host: "{plex_url}"', '  token: "benchmark"', 'channels:']
+    for number in range(channels):
+        playback = 'sequential' if number % 2 else 'shuffle'
+        lines += [f'  - name: "Channel {number}"', f'    playlist: "Playlist {number}"', f'    playback: {playback}']
+    lines += ['server:', '  snapshots: false', '  watch_config: false', '  lazy_warmup: false']
+    with open(path, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+
+def rss_bytes():
+    """Resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def bench_app(channels, tracks, lookups, requests):
+    """Load the app against a fake Plex server and time lookups and /current-song requests"""
+    results = {}
+    with FakePlexServer(tracks=tracks) as plex, tempfile.TemporaryDirectory() as temp_dir:
+        config_file = os.path.join(temp_dir, 'plex_radio_config.yaml')
+        write_config(config_file, plex.url, channels)
+        os.environ['PLEX_RADIO_CONFIG'] = config_file
+
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        import plex_radio_api
+        plex_radio_api.create_app(preload=False)
+        results["startup_seconds"] = time.perf_counter() - start
+        gc.collect()
+        rss_after = rss_bytes()
+        results["memory"] = {
+            "channels": channels,
+            "tracks_per_channel": tracks,
+            "rss_bytes": rss_after,
+            "app_rss_bytes": rss_after - rss_before if rss_before and rss_after else None,
+        }
+
+        # Spread lookups across the generated timeline so every chunk is searched
+        now = datetime.datetime.now()
+        rng = random.Random(0)
+        times = [now + datetime.timedelta(seconds=rng.uniform(-1800, 86399)) for _ in range(lookups)]
+        for name, function in (('locate_current_track_seconds', plex_radio_api.locate_current_track),
+                               ('calculate_current_song_info_seconds', plex_radio_api.calculate_current_song_info)):
+            samples = []
+            for index, when in enumerate(times):
+                channel = index % channels
+                begin = time.perf_counter()
+                function(channel, when)
+                samples.append(time.perf_counter() - begin)
+            results[name] = summarize(samples)
+
+        client = plex_radio_api.app.test_client()
+        etag = client.get('/current-song/0').headers.get('ETag')
+        for name, headers in (('current_song', {}), ('current_song_not_modified', {'If-None-Match': etag})):
+            samples = []
+            begin = time.perf_counter()
+            for index in range(requests):
+                start = time.perf_counter()
+                response = client.get(f'/current-song/{0 if headers else index % channels}', headers=headers)
+                samples.append(time.perf_counter() - start)
+                response.close()
+            elapsed = time.perf_counter() - begin
+            results[f"{name}_http"] = {
+                "requests": requests,
+                "requests_per_second": round(requests / elapsed, 1),
+                "latency_seconds": summarize(samples),
+            }
+
+        plex_radio_api.refresher.stop()
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=TOOLS_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def timing_metrics(results, prefix=''):
+    """Flatten results into {path: seconds} for every median latency"""
+    metrics = {}
+    if isinstance(results, dict):
+        for key, value in results.items():
+            if key == 'median' and isinstance(value, float):
+                metrics[prefix.rstrip('.')] = value
+            elif key != 'environment':
+                metrics.update(timing_metrics(value, f"{prefix}{key}."))
+    elif isinstance(results, list):
+        for item in results:
+            label = '.'.join(f"{key}={item[key]}" for key in ('tracks', 'playback') if key in item)
+            metrics.update(timing_metrics(item, f"{prefix}{label}."))
+    return metrics
+
+def compare(results, baseline, threshold):
+    """Return (metric, baseline, current) for timings slower than baseline by more than threshold"""
+    current = timing_metrics(results)
+    regressions = []
+    for name, previous in timing_metrics(baseline).items():
+        value = current.get(name)
+        if value is not None and previous > 0 and value > previous * (1 + threshold):
+            regressions.append((name, previous, value))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Plex Radio timeline generation and lookups")
+    parser.add_argument('--sizes', type=lambda value: [int(size) for size in value.split(',')],
+                        help=f"source playlist sizes (default: {','.join(map(str, DEFAULT_SIZES))})")
+    parser.add_argument('--repeat', type=int, default=20, help="runs per timeline benchmark")
+    parser.add_argument('--channels', type=int, default=4, help="channels loaded for the app benchmarks")
+    parser.add_argument('--app-tracks', type=int, default=2000, help="tracks per channel for the app benchmarks")
+    parser.add_argument('--lookups', type=int, default=20000, help="current-track lookups to time")
+    parser.add_argument('--requests', type=int, default=5000, help="HTTP requests to time")
+    parser.add_argument('--quick', action='store_true', help="small sizes and fewer runs, for CI")
+    parser.add_argument('--output', help="write JSON results to this file instead of stdout")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown vs. baseline (default: 0.25)")
+    args = parser.parse_args()
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    if args.quick:
+        args.repeat = min(args.repeat, 5)
+        args.lookups = min(args.lookups, 2000)
+        args.requests = min(args.requests, 500)
+
+    results = {
+        "environment": {
+            "timestamp": datetime.datetime.now().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+    }
+    # App output goes to stderr so stdout stays valid JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        results["timeline"] = bench_timeline(sizes, args.repeat)
+        results["schedule_memory"] = bench_schedule_memory(sizes)
+        results["app"] = bench_app(args.channels, args.app_tracks, args.lookups, args.requests)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for name, previous, value in regressions:
+            print(f"REGRESSION {name}: {previous * 1000:.3f} ms -> {value * 1000:.3f} ms", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for a Plex Media Server, for offline testing and load generation
+
+Serves the XML endpoints plexapi uses for Plex Radio (server root, library sections,
+playlist search and paged playlist items) with synthetic audio playlists.
+Any playlist title that is requested is created on the fly, so every channel
+in a config resolves. Responses can be slowed down or made to fail at random.
+
+    python tools/fake_plex_server.py --port 32400 --tracks 100000 --latency 0.05
+
+Then point the API at it in plex_radio_config.yaml:
+
+    plex:
+      host: "http://localhost:32400"
+      token: "anything"
+"""
+import argparse
+import random
+import threading
+import time
+import zlib
+from array import array
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+from xml.sax.saxutils import quoteattr
+
+DEFAULT_PAGE_SIZE = 100  # plexapi's default X-Plex-Container-Size
+
+class FakePlaylist:
+    """Synthetic audio playlist whose tracks are derived from a seed, so nothing is stored per track but durations"""
+    def __init__(self, playlist_id, title, track_count, seed):
+        self.playlist_id = playlist_id
+        self.title = title
+        self.updated_at = int(time.time())
+        self.rating_key_base = playlist_id * 1_000_000
+        self.durations = array('I')  # Milliseconds
+        self.rng = random.Random(f"{seed}:{title}")
+        self.append(track_count)
+
+    def append(self, count):
+        """Add count tracks to the end of the playlist and mark it as updated"""
+        self.durations.extend(self.rng.randint(90, 420) * 1000 for _ in range(count))
+        self.updated_at += 1
+
+    def to_xml(self):
+        return (
+            f'<Playlist ratingKey="{self.playlist_id}" key="/playlists/{self.playlist_id}/items" '
+            f'type="playlist" playlistType="audio" smart="0" title={quoteattr(self.title)} '
+            f'leafCount="{len(self.durations)}" duration="{sum(self.durations)}" '
+            f'addedAt="{self.updated_at}" updatedAt="{self.updated_at}"/>'
+        )
+
+    def track_xml(self, index):
+        rating_key = self.rating_key_base + index
+        artist = index % 997
+        album = index % 4999
+        duration = self.durations[index]
+        return (
+            f'<Track ratingKey="{rating_key}" key="/library/metadata/{rating_key}" type="track" '
+            f'title="Track {index + 1}" grandparentTitle="Artist {artist}" parentTitle="Album {album}" '
+            f'index="{index + 1}" duration="{duration}">'
+            f'<Media id="{rating_key}" duration="{duration}" audioCodec="mp3" container="mp3">'
+            f'<Part id="{rating_key}" key="/library/parts/{rating_key}/file.mp3" duration="{duration}"/>'
+            f'</Media></Track>'
+        )
+
+class FakePlexState:
+    """Playlists and fault-injection settings shared by all request handlers"""
+    def __init__(self, tracks=1000, playlist_tracks=None, latency=0.0, jitter=0.0,
+                 failure_rate=0.0, failure_status=500, token=None, seed=0):
+        self.tracks = tracks  # Track count for playlists created on first request
+        self.playlist_tracks = dict(playlist_tracks or {})  # Title -> track count overrides
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.token = token  # Required X-Plex-Token, or None to accept any
+        self.seed = seed
+        self.playlists = {}
+        self.requests = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def get_playlist(self, title):
+        with self._lock:
+            playlist = self.playlists.get(title.lower())
+            if playlist is None:
+                count = self.playlist_tracks.get(title, self.tracks)
+                playlist = FakePlaylist(self.playlist_id(title), title, count, self.seed)
+                self.playlists[title.lower()] = playlist
+            return playlist
+
+    def playlist_id(self, title):
+        """Stable id for a title, so rating keys survive restarts of the fake server"""
+        playlist_id = zlib.crc32(title.lower().encode('utf-8')) % 100_000 + 1
+        while any(playlist.playlist_id == playlist_id for playlist in self.playlists.values()):
+            playlist_id += 1
+        return playlist_id
+
+    def find_playlist(self, playlist_id):
+        with self._lock:
+            for playlist in self.playlists.values():
+                if playlist.playlist_id == playlist_id:
+                    return playlist
+        return None
+
+    def should_fail(self):
+        with self._lock:
+            self.requests += 1
+            if self.failure_rate and random.random() < self.failure_rate:
+                self.failures += 1
+                return True
+        return False
+
+    def delay(self):
+        return self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+
+class FakePlexHandler(BaseHTTPRequestHandler):
+    server_version = "FakePlex/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        params = {name: values[-1] for name, values in query.items()}
+
+        delay = self.state.delay()
+        if delay > 0:
+            time.sleep(delay)
+
+        if self.state.token and self.headers.get('X-Plex-Token', params.get('X-Plex-Token')) != self.state.token:
+            return self.send_xml('<MediaContainer size="0"/>', status=401)
+        if self.state.should_fail():
+            return self.send_xml('<MediaContainer size="0"/>', status=self.state.failure_status)
+
+        path = url.path.rstrip('/') or '/'
+        if path == '/':
+            return self.send_xml(
+                '<MediaContainer size="0" friendlyName="Fake Plex" machineIdentifier="fake-plex-server" '
+                'version="1.40.0.0" platform="Linux" myPlex="0" transcoderAudio="1"/>'
+            )
+        if path in ('/library', '/library/sections'):
+            return self.send_xml('<MediaContainer size="0" allowSync="0" title1="Plex Library"/>')
+        if path == '/playlists':
+            return self.send_playlists(params)
+
+        parts = path.split('/')
+        if len(parts) == 4 and parts[1] == 'playlists' and parts[3] == 'items' and parts[2].isdigit():
+            return self.send_items(int(parts[2]), params)
+        if len(parts) == 3 and parts[1] == 'playlists' and parts[2].isdigit():
+            playlist = self.state.find_playlist(int(parts[2]))
+            if playlist is not None:
+                return self.send_xml(f'<MediaContainer size="1">{playlist.to_xml()}</MediaContainer>')
+        self.send_xml('<MediaContainer size="0"/>', status=404)
+
+    def do_PUT(self):
+        """PUT /playlists/<title>/append?count=N adds tracks, for exercising incremental refreshes"""
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/')
+        if len(parts) == 3 and parts[0] == 'playlists' and parts[2] == 'append':
+            count = int(parse_qs(url.query).get('count', ['1'])[-1])
+            playlist = self.state.get_playlist(unquote(parts[1]))
+            with self.state._lock:
+                playlist.append(count)
+            return self.send_xml(f'<MediaContainer size="1">{playlist.to_xml()}</MediaContainer>')
+        self.send_xml('<MediaContainer size="0"/>', status=404)
+
+    def send_playlists(self, params):
+        title = params.get('title')
+        if title:
+            playlists = [self.state.get_playlist(title)]
+        else:
+            with self.state._lock:
+                playlists = list(self.state.playlists.values())
+        body = ''.join(playlist.to_xml() for playlist in playlists)
+        self.send_xml(f'<MediaContainer size="{len(playlists)}">{body}</MediaContainer>')
+
+    def send_items(self, playlist_id, params):
+        playlist = self.state.find_playlist(playlist_id)
+        if playlist is None:
+            return self.send_xml('<MediaContainer size="0"/>', status=404)
+
+        start = int(self.headers.get('X-Plex-Container-Start', params.get('X-Plex-Container-Start', 0)))
+        size = int(self.headers.get('X-Plex-Container-Size', params.get('X-Plex-Container-Size', DEFAULT_PAGE_SIZE)))
+        total = len(playlist.durations)
+        end = min(total, start + size)
+        body = ''.join(playlist.track_xml(index) for index in range(start, end))
+        self.send_xml(
+            f'<MediaContainer size="{max(end - start, 0)}" totalSize="{total}" offset="{start}" '
+            f'ratingKey="{playlist.playlist_id}" title={quoteattr(playlist.title)} '
+            f'leafCount="{total}" playlistType="audio">{body}</MediaContainer>'
+        )
+
+    def send_xml(self, body, status=200):
+        data = ('<?xml version="1.0" encoding="UTF-8"?>\n' + body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/xml;charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class FakePlexServer:
+    """Run the fake Plex server on a background thread, e.g. from a test or benchmark"""
+    def __init__(self, host='127.0.0.1', port=0, verbose=False, **options):
+        self.state = FakePlexState(**options)
+        self.httpd = ThreadingHTTPServer((host, port), FakePlexHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = self.state
+        self.httpd.verbose = verbose
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def parse_playlist_option(value):
+    """Parse a --playlist NAME=TRACKS option"""
+    title, _, count = value.rpartition('=')
+    if not title or not count.isdigit():
+        raise argparse.ArgumentTypeError(f"expected NAME=TRACKS, got {value!r}")
+    return title, int(count)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Plex Media Server for testing Plex Radio offline")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=32400)
+    parser.add_argument('--tracks', type=int, default=1000, help="tracks in each playlist (default: 1000)")
+    parser.add_argument('--playlist', action='append', type=parse_playlist_option, default=[], metavar='NAME=TRACKS',
+                        help="track count for a specific playlist title (repeatable)")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds to delay every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random delay of up to this many seconds")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="fraction of requests that fail (0-1)")
+    parser.add_argument('--failure-status', type=int, default=500, help="HTTP status for injected failures")
+    parser.add_argument('--token', default=None, help="require this X-Plex-Token (default: accept any)")
+    parser.add_argument('--seed', type=int, default=0, help="seed for synthetic track durations")
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    args = parser.parse_args()
+
+    server = FakePlexServer(
+        host=args.host, port=args.port, verbose=args.verbose,
+        tracks=args.tracks, playlist_tracks=dict(args.playlist), latency=args.latency, jitter=args.jitter,
+        failure_rate=args.failure_rate, failure_status=args.failure_status, token=args.token, seed=args.seed
+    )
+    print(f"Fake Plex server listening on {server.url}")
+    print(f"  Tracks per playlist: {args.tracks}, latency: {args.latency}s (+{args.jitter}s), failure rate: {args.failure_rate}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == "__main__":
+    main()